@@ -1,5 +1,28 @@
+import time
 import streamlit as st
 from email_code import EmailGenerator
+from email_sender import EmailSender
+from metrics import REGISTRY
+from bulk_sender import UnlimitedRateLimiter
+from pipeline import EmailPipeline
+from recipients import ImportStats, iter_recipients, iter_rows, normalize_email, validate_emails
+from sender_pool import POLICIES as SENDER_POLICIES, SenderPool
+from outcomes import TRANSIENT, get_shared_outcome_store
+from validation import get_shared_validator
+from send_queue import (FAILED, GENERATED, INTERRUPTED, PENDING, SENDING, SENT, CampaignManager, QueueWorker,
+                        SendQueue, campaign_id_for)
+
+RECIPIENTS_PER_PAGE = 20
+
+@st.cache_resource
+def get_send_queue():
+    """Process-wide durable send queue shared by all sessions"""
+    return SendQueue()
+
+@st.cache_resource
+def get_campaign_manager():
+    """Background campaign workers, owned outside st.session_state"""
+    return CampaignManager()
 
 def initialize_session_state():
     """Initialize all session state variables"""
@@ -14,17 +37,82 @@ def initialize_session_state():
         st.session_state.gmail_verified = False
     if 'gmail_creds' not in st.session_state:
         st.session_state.gmail_creds = None
+    if 'recipient_index' not in st.session_state:
+        st.session_state.recipient_index = set()
+    if 'recipient_fields' not in st.session_state:
+        st.session_state.recipient_fields = {}
+    if 'recipient_page' not in st.session_state:
+        st.session_state.recipient_page = 1
+    if 'review' not in st.session_state:
+        st.session_state.review = []
+    if 'active_campaigns' not in st.session_state:
+        st.session_state.active_campaigns = []
+    if 'sender_accounts' not in st.session_state:
+        st.session_state.sender_accounts = []
+    if 'sender_policy' not in st.session_state:
+        st.session_state.sender_policy = SENDER_POLICIES[0]
+    if 'sender_pool' not in st.session_state:
+        st.session_state.sender_pool = None
 
 def add_recipient():
     """Add a new recipient email to the list"""
-    new_recipient = st.session_state.new_recipient.strip()
-    if new_recipient and new_recipient not in st.session_state.recipients:
-        st.session_state.recipients.append(new_recipient)
+    new_recipient = normalize_email(st.session_state.new_recipient)
+    if new_recipient and new_recipient not in st.session_state.recipient_index:
+        if validate_emails([new_recipient])[0]:
+            st.session_state.recipients.append(new_recipient)
+            st.session_state.recipient_index.add(new_recipient)
+        else:
+            st.session_state.recipient_error = f"'{new_recipient}' is not a valid email address"
     st.session_state.new_recipient = ""
 
 def remove_recipient(email):
     """Remove a recipient email from the list"""
     st.session_state.recipients.remove(email)
+    st.session_state.recipient_index.discard(email)
+    st.session_state.recipient_fields.pop(email, None)
+
+def clear_recipients():
+    """Remove every recipient"""
+    st.session_state.recipients = []
+    st.session_state.recipient_index = set()
+    st.session_state.recipient_fields = {}
+    st.session_state.recipient_page = 1
+
+def import_recipients(uploaded_file):
+    """Stream a CSV/JSONL upload into the recipient list"""
+    stats = ImportStats()
+    rows = iter_rows(uploaded_file, uploaded_file.name.rsplit(".", 1)[-1])
+    for batch in iter_recipients(rows, st.session_state.recipient_index, stats):
+        st.session_state.recipients.extend(recipient.email for recipient in batch)
+        for recipient in batch:
+            if recipient.fields:
+                st.session_state.recipient_fields[recipient.email] = recipient.fields
+    return stats
+
+def add_sender_account(email, password):
+    """Add a verified Gmail account to the rotation"""
+    accounts = [a for a in st.session_state.sender_accounts if a["email"] != email]
+    st.session_state.sender_accounts = accounts + [{"email": email, "password": password}]
+    st.session_state.sender_pool = None
+
+def remove_sender_account(email):
+    """Remove a Gmail account from the rotation"""
+    st.session_state.sender_accounts = [a for a in st.session_state.sender_accounts if a["email"] != email]
+    st.session_state.sender_pool = None
+    if st.session_state.gmail_creds and st.session_state.gmail_creds["email"] == email:
+        accounts = st.session_state.sender_accounts
+        st.session_state.gmail_creds = dict(accounts[0]) if accounts else None
+        st.session_state.gmail_verified = bool(accounts)
+
+def get_sender_pool():
+    """Sender pool over the session's verified accounts, rebuilt when they change"""
+    pool = st.session_state.sender_pool
+    if pool is None or pool.policy != st.session_state.sender_policy:
+        pool = SenderPool(policy=st.session_state.sender_policy)
+        for account in st.session_state.sender_accounts:
+            pool.add_account(account["email"], account["password"])
+        st.session_state.sender_pool = pool
+    return pool
 
 def send_test_email_for_recipient(email):
     """Send a test email to a specific recipient"""
@@ -35,12 +123,190 @@ def send_test_email_for_recipient(email):
         else:
             st.error(f"Failed to send test email to {email}: {message}")
 
+def stream_draft_preview(generator, job_description, resume_text):
+    """Render the base draft as it streams in and return it once complete"""
+    st.subheader("Draft")
+    subject_box = st.empty()
+    body_box = st.empty()
+    subject_box.caption("Generating email draft...")
+    try:
+        for update in generator.stream_draft(job_description, resume_text):
+            subject_box.markdown(f"**Subject:** {update['subject']}")
+            body_box.text(update["body"])
+    except Exception as e:
+        st.error(f"Failed to generate email: {str(e)}")
+        return None
+    stats = generator.last_prompt_stats
+    if stats:
+        st.caption(f"Prompt inputs compacted from ~{stats['tokens_before']} to ~{stats['tokens_after']} tokens")
+    return {"subject": update["subject"], "body": update["body"]}
+
+def deliver_campaign(queue, campaign_id, generator, gmail_creds):
+    """Hand a campaign's generated messages to a background worker"""
+    if len(st.session_state.sender_accounts) > 1:
+        # Rotate across accounts; the sender pool applies per-account limits itself
+        sender_pool = get_sender_pool()
+        worker = QueueWorker(
+            queue,
+            campaign_id,
+            sender_pool.send_email,
+            gmail_creds["email"],
+            batch_size=generator.pool.max_sessions * len(sender_pool.accounts),
+            limiter=UnlimitedRateLimiter()
+        )
+    else:
+        # EmailSender records reply codes and failure classes for smart retries
+        sender = EmailSender(pool=generator.pool)
+        sender.smtp_server, sender.smtp_port = generator.smtp_server, generator.smtp_port
+        sender.credentials = gmail_creds
+        worker = QueueWorker(
+            queue,
+            campaign_id,
+            sender.send_email,
+            gmail_creds["email"],
+            batch_size=generator.pool.max_sessions,
+            retry=sender.retry_scheduler()
+        )
+    get_campaign_manager().start(worker)
+    if campaign_id not in st.session_state.active_campaigns:
+        st.session_state.active_campaigns.append(campaign_id)
+
+def render_campaign_progress(campaign_id):
+    """Show live progress and controls for one background campaign; returns True while it runs"""
+    worker = get_campaign_manager().get(campaign_id)
+    if worker is None:
+        return False
+
+    status = worker.status()
+    # Pending messages (e.g. drafts not approved) are not part of this run
+    total = status[GENERATED] + status[SENDING] + status[SENT] + status[FAILED]
+    st.header("Campaign Progress")
+    st.progress((status[SENT] + status[FAILED]) / total if total else 1.0)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Sent", status[SENT])
+    col2.metric("Failed", status[FAILED])
+    col3.metric("In flight", status["in_flight"])
+    col4.metric("ETA", f"{status['eta_seconds']:.0f}s" if status["eta_seconds"] is not None else "-")
+    st.caption(f"Status: {status['state']} ({status['rate_per_second']} emails/s)")
+
+    col1, col2, col3 = st.columns(3)
+    running = status["state"] in ("running", "paused")
+    with col1:
+        if worker.paused:
+            st.button("Resume", key=f"resume_{campaign_id}", on_click=worker.resume, disabled=not running)
+        else:
+            st.button("Pause", key=f"pause_{campaign_id}", on_click=worker.pause, disabled=not running)
+    with col2:
+        st.button("Cancel", key=f"cancel_{campaign_id}", on_click=worker.cancel, disabled=not running)
+    with col3:
+        st.button("Refresh", key=f"refresh_{campaign_id}")
+
+    for result in reversed(list(worker.recent)):
+        if result.success:
+            st.success(f"Email sent successfully to {result.recipient} ({result.send_seconds:.1f}s)")
+        else:
+            st.error(f"Failed to send email to {result.recipient}: {result.message}")
+
+    if not running:
+        if status[SENT] == total:
+            st.success("All emails sent successfully!")
+        elif status[SENT] == 0:
+            st.error("Failed to send any emails.")
+        else:
+            st.warning(f"Successfully sent {status[SENT]} out of {total} emails.")
+        if status[FAILED]:
+            # Only transient failures (421, timeouts, dropped connections) are worth retrying;
+            # interrupted sends have no confirmed outcome and may already have been delivered
+            failures = worker.queue.failures(campaign_id)
+            latest = get_shared_outcome_store().latest(failures)
+            retryable, unconfirmed = [], []
+            for recipient, error in failures.items():
+                outcome = latest.get(recipient)
+                if error == INTERRUPTED:
+                    unconfirmed.append(recipient)
+                elif outcome is not None and outcome.failure_class == TRANSIENT:
+                    retryable.append(recipient)
+            skipped = len(failures) - len(retryable) - len(unconfirmed)
+            if skipped:
+                st.caption(f"{skipped} failure(s) are permanent or authentication errors and will not be retried.")
+            if retryable and st.button(f"Retry {len(retryable)} transient failure(s)", key=f"retry_{campaign_id}"):
+                worker.queue.retry_failed(worker.campaign_id, retryable)
+                deliver_campaign(worker.queue, worker.campaign_id, st.session_state.generator,
+                                 st.session_state.gmail_creds)
+                st.rerun()
+            if unconfirmed:
+                st.warning(f"{len(unconfirmed)} message(s) were interrupted before delivery was confirmed and "
+                           f"may already have been delivered. Check the sent folder before resending: "
+                           f"{', '.join(unconfirmed)}")
+                if st.button(f"Resend {len(unconfirmed)} unconfirmed message(s) anyway",
+                             key=f"resend_{campaign_id}"):
+                    worker.queue.retry_failed(worker.campaign_id, unconfirmed)
+                    deliver_campaign(worker.queue, worker.campaign_id, st.session_state.generator,
+                                     st.session_state.gmail_creds)
+                    st.rerun()
+    return status["state"] == "running"
+
+def start_campaign(job_description, recipients):
+    """Queue, draft and start (or stage for review) one campaign; returns False on failure"""
+    generator = st.session_state.generator
+    generator.compact_prompts = st.session_state.get("compact_prompts", False)
+    gmail_creds = st.session_state.gmail_creds
+    fields = st.session_state.recipient_fields
+    queue = get_send_queue()
+
+    # Drop undeliverable addresses before paying for generation or a login
+    with st.spinner("Checking recipient domains..."):
+        recipients, rejected = get_shared_validator().filter(recipients)
+    if rejected:
+        st.warning(f"Skipping {len(rejected)} undeliverable recipient(s): "
+                   + ", ".join(f"{result.email} ({result.reason})" for result in rejected[:20]))
+    if not recipients:
+        st.error("None of the recipients can receive email.")
+        return False
+
+    campaign_id = campaign_id_for(gmail_creds["email"], job_description)
+    queue.create_campaign(campaign_id, gmail_creds["email"])
+    queue.enqueue(campaign_id, recipients)
+    already_sent = queue.progress(campaign_id)[SENT]
+    if already_sent:
+        st.info(f"Resuming campaign: {already_sent} recipient(s) already received this email and will be skipped.")
+
+    # Generate one base draft only if some recipients still need rendering
+    if queue.recipients_in_state(campaign_id, PENDING):
+        draft = stream_draft_preview(generator, job_description, st.session_state.resume_text)
+        if draft is None:
+            return False
+        if not st.session_state.review_before_send:
+            pending = queue.recipients_in_state(campaign_id, PENDING)
+            for recipient, email in generator.personalize_drafts(draft, pending, fields).items():
+                queue.mark_generated(campaign_id, recipient, email["subject"], email["body"])
+
+    if st.session_state.review_before_send:
+        pipeline = EmailPipeline(
+            generator,
+            lambda recipient, subject, body: generator.send_generated_email(recipient, subject, body, gmail_creds),
+            gmail_creds["email"]
+        )
+        with st.spinner("Preparing drafts for review..."):
+            items = pipeline.prepare(job_description, st.session_state.resume_text,
+                                     queue.recipients_in_state(campaign_id, PENDING), fields)
+        st.session_state.review.append({"campaign_id": campaign_id, "items": items})
+    else:
+        deliver_campaign(queue, campaign_id, generator, gmail_creds)
+    return True
+
 def main():
     st.title("AI Job Application Assistant")
     st.markdown("""🤖 Your personal AI assistant for crafting and sending job applications""")
 
     initialize_session_state()
 
+    with st.sidebar.expander("Performance metrics"):
+        st.json(REGISTRY.snapshot())
+    with st.sidebar.expander("Delivery history (24h)"):
+        st.json(get_shared_outcome_store().throughput(since=time.time() - 86400))
+
     setup_tab, compose_tab = st.tabs(["📝 Setup", "✉️ Compose & Send"])
 
     # Setup Tab
@@ -75,13 +341,30 @@ def main():
                     with st.spinner("Verifying Gmail access..."):
                         if st.session_state.generator.verify_gmail(sender_email, app_password):
                             st.session_state.gmail_verified = True
-                            st.session_state.gmail_creds = {"email": sender_email, "password": app_password}
+                            if not st.session_state.gmail_creds:
+                                st.session_state.gmail_creds = {"email": sender_email, "password": app_password}
+                            add_sender_account(sender_email, app_password)
                             st.success("Gmail credentials verified successfully!")
                         else:
                             st.error("Gmail verification failed. Please check your credentials.")
                 else:
                     st.warning("Please enter both email and app password")
 
+            # Verified accounts messages are rotated across
+            if st.session_state.sender_accounts:
+                st.write("Sending accounts:")
+                for account in st.session_state.sender_accounts:
+                    col_email, col_remove = st.columns([3, 1])
+                    with col_email:
+                        st.text(account["email"])
+                    with col_remove:
+                        st.button("Remove", key=f"remove_sender_{account['email']}",
+                                  on_click=remove_sender_account, args=(account["email"],))
+                if len(st.session_state.sender_accounts) > 1:
+                    st.selectbox("Account rotation", SENDER_POLICIES, key="sender_policy")
+                    with st.expander("Account usage"):
+                        st.table(get_sender_pool().usage())
+
     # Compose & Send Tab
     with compose_tab:
         # Check prerequisites
@@ -100,13 +383,40 @@ def main():
         with col2:
             st.button("Add", on_click=add_recipient)
 
-        # Display recipients with Send Test Email button
+        if st.session_state.get("recipient_error"):
+            st.error(st.session_state.pop("recipient_error"))
+
+        with st.expander("Import recipients from CSV/JSONL"):
+            st.caption("Columns: email (required), name, company, job_description, notes")
+            import_file = st.file_uploader("Recipient list", type=['csv', 'jsonl'], key="recipient_file")
+            if import_file and st.button("Import"):
+                with st.spinner("Importing recipients..."):
+                    stats = import_recipients(import_file)
+                st.success(f"Imported {stats.imported} of {stats.rows} rows "
+                           f"({stats.duplicates} duplicates, {stats.invalid} invalid)")
+                if stats.invalid_samples:
+                    st.caption("Invalid examples: " + ", ".join(stats.invalid_samples))
+
+        # Display recipients one page at a time with Send Test Email button
         if st.session_state.recipients:
-            st.write("Current recipients:")
-            for email in st.session_state.recipients:
+            total = len(st.session_state.recipients)
+            pages = (total - 1) // RECIPIENTS_PER_PAGE + 1
+            st.session_state.recipient_page = min(st.session_state.recipient_page, pages)
+            col1, col2, col3 = st.columns([2, 1, 1])
+            with col1:
+                st.write(f"Current recipients: {total}")
+            with col2:
+                page = st.number_input("Page", min_value=1, max_value=pages, key="recipient_page")
+            with col3:
+                st.button("Clear all", on_click=clear_recipients)
+
+            start = (page - 1) * RECIPIENTS_PER_PAGE
+            for email in st.session_state.recipients[start:start + RECIPIENTS_PER_PAGE]:
                 col1, col2, col3 = st.columns([3, 1, 1])
                 with col1:
-                    st.text(email)
+                    fields = st.session_state.recipient_fields.get(email, {})
+                    details = ", ".join(fields[k] for k in ("recipient_name", "company") if k in fields)
+                    st.text(f"{email} ({details})" if details else email)
                 with col2:
                     st.button("Remove", key=f"remove_{email}", on_click=remove_recipient, args=(email,))
                 with col3:
@@ -122,44 +432,65 @@ def main():
         # Chat input
         user_input = st.text_area("Describe the job or ask questions", placeholder="Paste job description or ask questions about crafting the email...")
 
-        if st.button("Generate and Send Email"):
-            if not user_input:
-                st.warning("Please enter a job description or question.")
-                return
+        st.checkbox("Review drafts before sending", key="review_before_send")
+        st.checkbox("Compact resume and job description to save tokens", key="compact_prompts",
+                    help="Summarizes the resume into key sections and drops EEO/job-board boilerplate")
 
+        if st.button("Generate and Send Email"):
             if not st.session_state.recipients:
                 st.error("Please add at least one recipient before sending.")
                 return
 
-            # Generate and send email to each recipient
-            with st.spinner("Generating and sending emails..."):
-                success_count = 0
-                for recipient in st.session_state.recipients:
-                    success, result = st.session_state.generator.generate_and_send_email(
-                        user_input,
-                        st.session_state.resume_text,
-                        recipient,
-                        st.session_state.gmail_creds
-                    )
-                    
-                    if success:
-                        success_count += 1
-                        st.success(f"Email sent successfully to {recipient}")
-                        
-                        # Display the sent email content
-                        with st.expander(f"View email sent to {recipient}"):
-                            st.text_input("Subject", value=result["subject"], disabled=True)
-                            st.text_area("Body", value=result["body"], height=300, disabled=True)
-                    else:
-                        st.error(f"Failed to send email to {recipient}: {result}")
+            # Imported rows may carry their own job description; the rest use the chat input
+            groups = {}
+            for recipient in st.session_state.recipients:
+                job_description = st.session_state.recipient_fields.get(recipient, {}).get("job_description") or user_input
+                groups.setdefault(job_description, []).append(recipient)
 
-                # Final summary
-                if success_count == len(st.session_state.recipients):
-                    st.success("All emails sent successfully!")
-                elif success_count == 0:
-                    st.error("Failed to send any emails.")
-                else:
-                    st.warning(f"Successfully sent {success_count} out of {len(st.session_state.recipients)} emails.")
+            if "" in groups:
+                st.warning("Please enter a job description or question.")
+                return
+
+            for job_description, recipients in groups.items():
+                if len(groups) > 1:
+                    st.subheader(f"Campaign for {len(recipients)} recipient(s)")
+                if not start_campaign(job_description, recipients):
+                    return
+
+        # Review drafts and send the approved ones
+        for review in list(st.session_state.review):
+            st.header("Review Drafts")
+            campaign_id = review["campaign_id"]
+            for item in review["items"]:
+                if item.error:
+                    st.error(f"Could not prepare email for {item.recipient}: {item.error}")
+                    continue
+                st.checkbox(f"Approve email to {item.recipient}", value=True, key=f"approve_{campaign_id}_{item.recipient}")
+                with st.expander(f"Draft for {item.recipient}"):
+                    st.text_input("Subject", value=item.subject, disabled=True, key=f"review_subject_{campaign_id}_{item.recipient}")
+                    st.text_area("Body", value=item.body, height=300, disabled=True, key=f"review_body_{campaign_id}_{item.recipient}")
+
+            if st.button("Send Approved Emails", key=f"send_approved_{campaign_id}"):
+                generator = st.session_state.generator
+                queue = get_send_queue()
+                for item in review["items"]:
+                    if not item.error and st.session_state.get(f"approve_{campaign_id}_{item.recipient}"):
+                        queue.mark_generated(campaign_id, item.recipient, item.subject, item.body)
+                st.session_state.review.remove(review)
+                deliver_campaign(queue, campaign_id, generator, st.session_state.gmail_creds)
+
+        # Campaigns outlive the session that started them, so pick up this sender's running
+        # workers too; after a browser reload the session list starts empty
+        gmail_creds = st.session_state.gmail_creds
+        for worker in get_campaign_manager().active():
+            if (gmail_creds and worker.account == gmail_creds["email"]
+                    and worker.campaign_id not in st.session_state.active_campaigns):
+                st.session_state.active_campaigns.append(worker.campaign_id)
+        running = [render_campaign_progress(campaign_id) for campaign_id in st.session_state.active_campaigns]
+        if any(running):
+            # Poll again shortly, once every campaign has rendered; any widget interaction interrupts the wait
+            time.sleep(1)
+            st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,380 @@
+# benchmarks/run_benchmarks.py
+#
+# Reproducible throughput/latency benchmarks for the send and generate paths.
+# Run from the repository root:
+#
+#     python -m benchmarks.run_benchmarks --output bench_results.json
+#     python -m benchmarks.run_benchmarks --compare bench_results.json
+#     python -m benchmarks.run_benchmarks --only import_time --compare benchmarks/import_time_baseline.json
+#
+# Everything talks to local stand-ins (benchmarks/servers.py); no network
+# access or real credentials are needed.
+
+import argparse
+import io
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.servers import FakeChatServer, SMTPSink, make_pdf
+
+SENDER = {"email": "bench@localhost", "password": ""}
+JOB_DESCRIPTION = "Senior Python engineer to build distributed data pipelines. " * 20
+PROFILE = "Software engineer with 5 years of Python, SQL and cloud experience. " * 40
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(name: str, size: int, fn: Callable[[], List[float]]) -> Dict:
+    """Run ``fn`` (which returns per-item latencies) and collect summary statistics"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    latencies = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "name": name,
+        "size": size,
+        "seconds": round(elapsed, 4),
+        "per_second": round(size / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def make_pool():
+    from smtp_pool import SMTPConnectionPool
+    return SMTPConnectionPool(max_sessions=8, use_tls=False, authenticate=False)
+
+
+def unthrottled_account():
+    # Benchmarks measure our own overhead, not the Gmail quota
+    from bulk_sender import get_account_limiter
+    get_account_limiter(SENDER["email"], per_minute=10 ** 7, per_day=10 ** 9)
+
+
+def make_sender(sink: SMTPSink):
+    from email_sender import EmailSender
+    from outcomes import OutcomeStore
+
+    # Record benchmark attempts in a scratch store, not ./send_outcomes.db
+    scratch = tempfile.mkdtemp(prefix="bench-outcomes-")
+    sender = EmailSender(pool=make_pool(), outcomes=OutcomeStore(os.path.join(scratch, "send_outcomes.db")))
+    sender.smtp_server, sender.smtp_port = "127.0.0.1", sink.port
+    sender.credentials = dict(SENDER)
+    return sender, scratch
+
+
+def close_sender(sender, scratch: str):
+    sender.pool.close_all()
+    sender.outcomes.close()
+    shutil.rmtree(scratch, ignore_errors=True)
+
+
+def bench_bulk_send(sink: SMTPSink, size: int) -> Dict:
+    sender, scratch = make_sender(sink)
+
+    def run():
+        from bulk_sender import SendJob
+        jobs = [SendJob(f"user{i}@example.com", "Benchmark", "Hello from the benchmark") for i in range(size)]
+        return [r.queued_seconds + r.send_seconds for r in sender.send_bulk_jobs(jobs, max_workers=8)]
+
+    result = measure("bulk_send", size, run)
+    close_sender(sender, scratch)
+    return result
+
+
+def bench_bcc_send(sink: SMTPSink, size: int) -> Dict:
+    sender, scratch = make_sender(sink)
+
+    def run():
+        started = time.perf_counter()
+        outcome = sender.send_bulk_emails([f"user{i}@example.com" for i in range(size)],
+                                          "Benchmark", "Hello from the benchmark", bcc=True)
+        if not all(outcome.values()):
+            raise RuntimeError("BCC batch failed")
+        return [time.perf_counter() - started]
+
+    result = measure("bcc_send", size, run)
+    close_sender(sender, scratch)
+    return result
+
+
+def bench_mime_build(size: int) -> Dict:
+    from message_builder import message_template
+
+    def run():
+        latencies = []
+        for i in range(size):
+            started = time.perf_counter()
+            message_template(SENDER["email"], "Benchmark", PROFILE).render(f"user{i}@example.com")
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    return measure("mime_build", size, run)
+
+
+def bench_validate(sink: SMTPSink, size: int, dns_latency: float = 0.02) -> Dict:
+    from validation import RecipientValidator
+
+    def resolver(domain):
+        time.sleep(dns_latency)
+        return ["127.0.0.1"]
+
+    validator = RecipientValidator(resolver=resolver, probe=True, probe_sender=SENDER["email"],
+                                   probe_port=sink.port)
+
+    def run():
+        started = time.perf_counter()
+        # Ten recipients per domain, so the MX cache and per-domain probes matter
+        emails = [f"user{i}@domain{i // 10}.example" for i in range(size)]
+        if not all(result.deliverable for result in validator.validate(emails)):
+            raise RuntimeError("Validation rejected a deliverable address")
+        return [time.perf_counter() - started]
+
+    result = measure("validate", size, run)
+    validator.probe_pool.close_all()
+    return result
+
+
+def make_generator(chat: FakeChatServer, pool, cache_entries: int = 256):
+    from email_code import EmailGenerator
+    from llm_cache import LLMResponseCache
+    from llm_scheduler import GenerationScheduler
+
+    generator = EmailGenerator(
+        "bench-key",
+        pool=pool,
+        cache=LLMResponseCache(max_entries=cache_entries),
+        scheduler=GenerationScheduler(max_in_flight=8, requests_per_minute=10 ** 7, tokens_per_minute=10 ** 10),
+        base_url=chat.base_url,
+    )
+    generator.smtp_server = "127.0.0.1"
+    return generator
+
+
+def bench_generate_and_send(sink: SMTPSink, chat: FakeChatServer, size: int) -> Dict:
+    # No cache: every send pays for a generation, as with a new job description each time
+    generator = make_generator(chat, make_pool(), cache_entries=0)
+    generator.smtp_port = sink.port
+    requests_before = chat.requests
+
+    def run():
+        latencies = []
+        for i in range(size):
+            started = time.perf_counter()
+            success, result = generator.generate_and_send_email(
+                JOB_DESCRIPTION, PROFILE, f"user{i}@example.com", SENDER
+            )
+            if not success:
+                raise RuntimeError(result)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    result = measure("generate_and_send", size, run)
+    result["llm_cache"] = generator.cache.stats()
+    result["llm_requests"] = chat.requests - requests_before
+    generator.pool.close_all()
+    return result
+
+
+def bench_pipeline_personalized(sink: SMTPSink, chat: FakeChatServer, size: int) -> Dict:
+    from pipeline import EmailPipeline
+
+    generator = make_generator(chat, make_pool())
+    generator.smtp_port = sink.port
+    pipeline = EmailPipeline(
+        generator,
+        lambda recipient, subject, body: generator.send_generated_email(recipient, subject, body, SENDER),
+        SENDER["email"],
+        generate_workers=8,
+        deliver_workers=8,
+        use_llm=True,
+    )
+    recipients = [f"user{i}@example.com" for i in range(size)]
+    # Distinct names make every opening rewrite a separate LLM call, not a cache hit
+    fields = {recipient: {"recipient_name": f"Reader {i}"} for i, recipient in enumerate(recipients)}
+    requests_before = chat.requests
+
+    def run():
+        started = time.perf_counter()
+        completed = []
+        results = pipeline.run(
+            JOB_DESCRIPTION, PROFILE, recipients, fields,
+            on_result=lambda r: completed.append(time.perf_counter() - started)
+        )
+        failures = [r for r in results if not r.success]
+        if failures:
+            raise RuntimeError(failures[0].message)
+        return completed
+
+    result = measure("pipeline_personalized", size, run)
+    result["llm_cache"] = generator.cache.stats()
+    result["llm_requests"] = chat.requests - requests_before
+    generator.pool.close_all()
+    return result
+
+
+class _Upload(io.BytesIO):
+    type = "application/pdf"
+
+
+def bench_read_resume(pages: int, parallel: bool = False) -> Dict:
+    import email_code
+
+    generator = email_code.EmailGenerator("bench-key")
+    data = make_pdf(pages)
+
+    timings = {}
+
+    def run():
+        email_code._resume_cache.clear()
+        started = time.perf_counter()
+        text, error = generator.read_resume(_Upload(data), parallel=parallel)
+        if error:
+            raise RuntimeError(error)
+        timings["cold_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        started = time.perf_counter()
+        generator.read_resume(_Upload(data), parallel=parallel)
+        timings["warm_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return []
+
+    result = measure("read_resume_parallel" if parallel else "read_resume", pages, run)
+    for key in ("per_second", "p50_ms", "p95_ms", "p99_ms", "mean_ms"):
+        del result[key]
+    result.update(timings)
+    return result
+
+
+def import_time_us(module: str) -> int:
+    """Cumulative import time of ``module`` in a fresh interpreter, from ``-X importtime``"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=root, capture_output=True, text=True)
+    if completed.returncode:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    for line in completed.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def bench_import_time(modules: List[str], repeats: int = 5) -> Dict:
+    timings = {}
+
+    def run():
+        latencies = []
+        for module in modules:
+            samples = [import_time_us(module) / 1e6 for _ in range(repeats)]
+            timings[module] = round(statistics.median(samples) * 1000, 3)
+            latencies.extend(samples)
+        return latencies
+
+    result = measure("import_time", len(modules) * repeats, run)
+    result["median_ms"] = timings
+    return result
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Report scenarios whose throughput dropped by more than ``tolerance``"""
+    with open(baseline_path) as f:
+        baseline = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get((result["name"], result["size"]))
+        if not before or not before.get("per_second") or not result.get("per_second"):
+            continue
+        if result["per_second"] < before["per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{result['name']}[{result['size']}]: {before['per_second']}/s -> {result['per_second']}/s"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the generate-and-send path against local stand-ins")
+    parser.add_argument("--sizes", default="10,100,1000", help="comma-separated recipient counts")
+    parser.add_argument("--pages", default="1,10,50,200", help="comma-separated PDF page counts")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM latency in seconds")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of LLM requests that fail")
+    parser.add_argument("--smtp-latency", type=float, default=0.0, help="fake SMTP per-message latency")
+    parser.add_argument("--import-modules", default="email_code,email_sender,send_queue,pipeline",
+                        help="comma-separated modules to time with -X importtime")
+    parser.add_argument("--only", default="", help="comma-separated scenario names to run")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON to check for throughput regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop vs. baseline")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    pages = [int(p) for p in args.pages.split(",") if p]
+    only = set(filter(None, args.only.split(",")))
+    wanted = lambda name: not only or name in only
+
+    sink = SMTPSink(latency=args.smtp_latency).start()
+    chat = FakeChatServer(latency=args.llm_latency, error_rate=args.llm_error_rate).start()
+    unthrottled_account()
+
+    results = []
+    for size in sizes:
+        if wanted("bulk_send"):
+            results.append(bench_bulk_send(sink, size))
+        if wanted("bcc_send"):
+            results.append(bench_bcc_send(sink, size))
+        if wanted("mime_build"):
+            results.append(bench_mime_build(size))
+        if wanted("validate"):
+            results.append(bench_validate(sink, size))
+        if wanted("generate_and_send"):
+            results.append(bench_generate_and_send(sink, chat, size))
+        if wanted("pipeline_personalized"):
+            results.append(bench_pipeline_personalized(sink, chat, size))
+    for count in pages:
+        if wanted("read_resume"):
+            results.append(bench_read_resume(count))
+        if wanted("read_resume_parallel"):
+            results.append(bench_read_resume(count, parallel=True))
+    if wanted("import_time"):
+        results.append(bench_import_time([m for m in args.import_modules.split(",") if m]))
+
+    report = {
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
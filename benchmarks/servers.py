@@ -0,0 +1,219 @@
+# benchmarks/servers.py
+#
+# Local stand-ins for smtp.gmail.com and the Groq API so benchmarks run
+# offline and reproducibly.
+
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = """SUBJECT: Application for the Senior Python Engineer role
+
+Dear {recipient_name},
+
+I am excited to apply for this position. My background matches the requirements closely
+and I would welcome the chance to contribute to Acme.
+
+I would love to discuss how I can help. Are you available for a short call next week?
+
+Best regards
+---END---"""
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        self.reply("220 localhost ESMTP sink")
+        in_data = False
+        accepted = 0
+        for raw in self.rfile:
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            if in_data:
+                if line == ".":
+                    in_data = False
+                    if self.server.latency:
+                        time.sleep(self.server.latency)
+                    with self.server.lock:
+                        self.server.messages += 1
+                    if self.server.drop_after_data:
+                        return
+                    self.reply("250 2.0.0 queued")
+                    accepted += 1
+                    if accepted == self.server.messages_per_connection:
+                        return
+                continue
+
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                in_data = True
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == "QUIT":
+                self.reply("221 2.0.0 Bye")
+                return
+            elif command == "RCPT" and "reject" in line.lower():
+                self.reply("550 5.1.1 No such user")
+            else:
+                self.reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Minimal plaintext SMTP server that accepts and counts messages and
+    connections. Recipients containing "reject" are refused with 550.
+    With ``messages_per_connection`` the server hangs up after that many
+    messages; with ``drop_after_data`` it hangs up after receiving each
+    message, before replying to it.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, messages_per_connection=None,
+                 drop_after_data=False):
+        super().__init__((host, port), _SMTPSinkHandler)
+        self.latency = latency
+        self.messages_per_connection = messages_per_connection
+        self.drop_after_data = drop_after_data
+        self.messages = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True, name="smtp-sink").start()
+        return self
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            failing = server.requests <= server.fail_first
+
+        if server.latency:
+            time.sleep(server.latency)
+        if failing or (server.error_rate and random.random() < server.error_rate):
+            status = 429 if failing else random.choice((429, 500))
+            self._json(status, {"error": {"message": "injected failure", "type": "server_error"}},
+                       {"retry-after": "0"} if status == 429 else None)
+            return
+
+        prompt = "".join(message.get("content", "") for message in request.get("messages", []))
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(server.reply) // 4,
+            "total_tokens": (len(prompt) + len(server.reply)) // 4,
+        }
+        base = {"id": "chatcmpl-bench", "created": int(time.time()), "model": request.get("model", "")}
+
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(server.reply), 16):
+                chunk = dict(base, object="chat.completion.chunk", choices=[
+                    {"index": 0, "delta": {"content": server.reply[i:i + 16]}, "finish_reason": None}
+                ])
+                self._chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._chunk("data: [DONE]\n\n")
+            self._chunk("")
+            return
+
+        self._json(200, dict(base, object="chat.completion", usage=usage, choices=[
+            {"index": 0, "message": {"role": "assistant", "content": server.reply}, "finish_reason": "stop"}
+        ]))
+
+    def _chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+
+class FakeChatServer(ThreadingHTTPServer):
+    """
+    OpenAI/Groq-compatible chat-completions endpoint with injectable
+    latency and error rate (429 with Retry-After: 0, or 500). The first
+    ``fail_first`` requests always get the 429.
+    Point EmailGenerator at it with base_url=server.base_url.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, reply=DEFAULT_REPLY,
+                 fail_first=0):
+        super().__init__((host, port), _ChatHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_first = fail_first
+        self.reply = reply
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True, name="fake-chat").start()
+        return self
+
+
+def make_pdf(pages, lines_per_page=40):
+    """Build a text-bearing PDF with the given page count, without extra dependencies"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        text = " ".join(
+            f"({f'Page {page + 1} line {line}: Python, SQL, distributed systems, 5 years experience'}) Tj T*"
+            for line in range(lines_per_page)
+        )
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("ascii")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+    return bytes(out)
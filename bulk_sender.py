@@ -0,0 +1,161 @@
+# bulk_sender.py
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SendFunction = Callable[[str, str, str], Tuple[bool, str]]
+
+
+@dataclass
+class SendJob:
+    recipient: str
+    subject: str
+    body: str
+
+
+@dataclass
+class SendResult:
+    recipient: str
+    success: bool
+    message: str
+    queued_seconds: float = 0.0
+    send_seconds: float = 0.0
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float = 1) -> float:
+        """Seconds until ``amount`` tokens are available (0 if available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float = 1):
+        self.tokens -= amount
+
+
+class AccountRateLimiter:
+    """
+    Per-account send limiter combining a per-minute and a per-day bucket
+    so bursts stay under the provider's short and long window quotas.
+    """
+
+    def __init__(self, per_minute: int = 60, per_day: int = 500):
+        self._lock = threading.Lock()
+        self._buckets = [
+            TokenBucket(per_minute / 60.0, per_minute),
+            TokenBucket(per_day / 86400.0, per_day),
+        ]
+
+    def acquire(self, max_wait: float = 120.0, amount: int = 1) -> bool:
+        """
+        Block until ``amount`` sends are allowed.
+
+        Returns:
+            bool: False if the quota would not free up within ``max_wait`` seconds
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                wait = max(bucket.wait_time(amount) for bucket in self._buckets)
+                if wait == 0:
+                    for bucket in self._buckets:
+                        bucket.consume(amount)
+                    return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class UnlimitedRateLimiter:
+    """Limiter that never blocks, for send functions that rate-limit themselves"""
+
+    def acquire(self, max_wait: float = 0.0, amount: int = 1) -> bool:
+        return True
+
+
+_limiters: Dict[str, AccountRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_account_limiter(account: str, per_minute: int = 60, per_day: int = 500) -> AccountRateLimiter:
+    """Return the process-wide limiter for a sender account, creating it on first use"""
+    with _limiters_lock:
+        limiter = _limiters.get(account)
+        if limiter is None:
+            limiter = AccountRateLimiter(per_minute, per_day)
+            _limiters[account] = limiter
+        return limiter
+
+
+class BulkSender:
+    """
+    Dispatch many (recipient, subject, body) jobs concurrently through a
+    send function such as EmailSender.send_email, with a bounded number
+    of workers and a per-account rate limit.
+    """
+
+    def __init__(self, send_fn: SendFunction, account: str, max_workers: int = 4,
+                 limiter: Optional[AccountRateLimiter] = None, max_wait: float = 120.0):
+        self.send_fn = send_fn
+        self.account = account
+        self.max_workers = max_workers
+        self.limiter = limiter or get_account_limiter(account)
+        self.max_wait = max_wait
+
+    def _run(self, job: SendJob, queued_at: float) -> SendResult:
+        if not self.limiter.acquire(self.max_wait):
+            return SendResult(job.recipient, False, f"Rate limit reached for {self.account}",
+                              queued_seconds=time.monotonic() - queued_at)
+
+        started = time.monotonic()
+        try:
+            success, message = self.send_fn(job.recipient, job.subject, job.body)
+        except Exception as e:
+            logger.error(f"Error sending to {job.recipient}: {str(e)}")
+            success, message = False, str(e)
+        return SendResult(job.recipient, success, message,
+                          queued_seconds=started - queued_at,
+                          send_seconds=time.monotonic() - started)
+
+    def send(self, jobs: Sequence[SendJob],
+             on_result: Optional[Callable[[SendResult], None]] = None) -> List[SendResult]:
+        """
+        Send every job and wait for completion. ``on_result`` is called
+        from the calling thread as each job finishes.
+
+        Returns:
+            List[SendResult]: one result per job, in the order given
+        """
+        queued_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._run, job, queued_at) for job in jobs]
+            if on_result:
+                for future in as_completed(futures):
+                    on_result(future.result())
+            results = [future.result() for future in futures]
+
+        sent = sum(result.success for result in results)
+        elapsed = time.monotonic() - queued_at
+        logger.info(f"Bulk send finished: {sent}/{len(results)} sent in {elapsed:.2f}s")
+        return results
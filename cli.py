@@ -0,0 +1,328 @@
+# cli.py
+#
+# Headless batch runs outside Streamlit, e.g. from cron or a worker node:
+#
+#     python cli.py send --resume resume.pdf --jobs jobs.jsonl --recipients list.csv
+#
+# Credentials come from the environment: GROQ_API_KEY, GMAIL_ADDRESS and
+# GMAIL_APP_PASSWORD.
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from email_code import EmailGenerator
+from bulk_sender import SendJob, SendResult
+from email_sender import EmailSender
+from metrics import REGISTRY, serve_metrics
+from outcomes import TRANSIENT
+from pipeline import EmailPipeline
+from recipients import BATCH_SIZE, ImportStats, Recipient, iter_recipients, iter_rows
+from send_queue import SendQueue, campaign_id_for
+from smtp_pool import SMTPConnectionPool, get_shared_pool
+from validation import RecipientValidator
+
+logger = logging.getLogger(__name__)
+
+
+def iter_jobs(path: str) -> Iterator[Dict[str, object]]:
+    """
+    Stream jobs from a JSONL file. Each line needs a ``job_description``
+    and may carry an ``id`` and an inline ``recipients`` list (addresses
+    or objects with email/name/company).
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping malformed job on line {line_number}")
+                continue
+            if not isinstance(job, dict) or not job.get("job_description"):
+                logger.warning(f"Skipping job without a job_description on line {line_number}")
+                continue
+            job.setdefault("id", str(line_number))
+            yield job
+
+
+def _inline_rows(job: Dict[str, object]) -> Iterator[Dict[str, str]]:
+    for entry in job.get("recipients") or []:
+        row = dict(entry) if isinstance(entry, dict) else {"email": str(entry)}
+        if "name" in row:
+            row.setdefault("recipient_name", row.pop("name"))
+        yield row
+
+
+def iter_work(jobs: Iterable[Dict[str, object]], recipients_path: Optional[str], stats: ImportStats,
+              batch_size: int = BATCH_SIZE) -> Iterator[Tuple[str, str, List[Recipient]]]:
+    """
+    Yield (job id, job description, recipients) groups in bounded batches.
+
+    Jobs are consumed as a stream. Inline job recipients go with their job.
+    Rows from the recipients file use their own job_description column,
+    falling back to the first job.
+    """
+    default = None
+    for job in jobs:
+        if default is None:
+            default = job
+        for batch in iter_recipients(_inline_rows(job), stats=stats, batch_size=batch_size):
+            yield str(job["id"]), str(job["job_description"]), batch
+
+    if not recipients_path:
+        return
+    seen = set()
+    for batch in iter_recipients(iter_rows(recipients_path), seen=seen, stats=stats, batch_size=batch_size):
+        groups: Dict[str, List[Recipient]] = {}
+        for recipient in batch:
+            job_description = recipient.fields.get("job_description") or (default and default["job_description"])
+            if not job_description:
+                logger.warning(f"Skipping {recipient.email}: no job description")
+                continue
+            groups.setdefault(job_description, []).append(recipient)
+        for job_description, group in groups.items():
+            job_id = str(default["id"]) if default and job_description == default["job_description"] else "row"
+            yield job_id, job_description, group
+
+
+class ResultWriter:
+    """Thread-safe JSONL result sink with running totals"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.counts = {"sent": 0, "failed": 0, "rejected": 0, "drafted": 0, "skipped": 0}
+        self.send_seconds: List[float] = []
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, object]):
+        with self._lock:
+            self.counts[record["status"]] += 1
+            if "send_seconds" in record:
+                self.send_seconds.append(record["send_seconds"])
+            self.stream.write(json.dumps(record) + "\n")
+            self.stream.flush()
+
+
+class RetryingDelivery:
+    """
+    Pipeline send function that makes one attempt per message and holds
+    back transient failures, so ``retry`` can redeliver them through the
+    retry scheduler with backoff instead of blocking a delivery worker.
+    """
+
+    def __init__(self, sender: EmailSender, max_attempts: int, base_delay: float):
+        self.sender = sender
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.deferred: Dict[str, SendJob] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, recipient: str, subject: str, body: str) -> Tuple[bool, str]:
+        outcome = self.sender.attempt(recipient, subject, body)
+        if outcome.success:
+            return True, outcome.message
+        if outcome.failure_class == TRANSIENT and self.max_attempts > 1:
+            with self._lock:
+                self.deferred[recipient] = SendJob(recipient, subject, body)
+        return False, f"Failed to send email: {outcome.message}"
+
+    def is_deferred(self, recipient: str) -> bool:
+        with self._lock:
+            return recipient in self.deferred
+
+    def retry(self, on_outcome):
+        """Redeliver the held-back messages, reporting each final outcome"""
+        with self._lock:
+            jobs, self.deferred = list(self.deferred.values()), {}
+        if jobs:
+            self.sender.send_with_retries(jobs, max_attempts=self.max_attempts, base_delay=self.base_delay,
+                                          on_outcome=on_outcome, previous_attempts=1)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def _read_resume(generator: EmailGenerator, path: str) -> str:
+    if path.lower().endswith(".txt"):
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip()
+    with open(path, "rb") as f:
+        text, error = generator.read_resume(f)
+    if error:
+        raise SystemExit(f"Could not read resume: {error}")
+    return text
+
+
+def send(args) -> int:
+    api_key = os.environ.get("GROQ_API_KEY")
+    sender_email = args.sender or os.environ.get("GMAIL_ADDRESS")
+    password = os.environ.get("GMAIL_APP_PASSWORD", "")
+    if not api_key:
+        raise SystemExit("GROQ_API_KEY is not set")
+    if not sender_email:
+        raise SystemExit("Pass --sender or set GMAIL_ADDRESS")
+    if not args.jobs and not args.job_description:
+        raise SystemExit("Pass --jobs or --job-description")
+
+    # --plain-smtp talks to a local test server without STARTTLS or login
+    pool = (SMTPConnectionPool(max_sessions=args.workers, use_tls=False, authenticate=False)
+            if args.plain_smtp else get_shared_pool())
+    generator = EmailGenerator(api_key, pool=pool, base_url=args.llm_base_url)
+    generator.compact_prompts = args.compact
+    generator.smtp_server, generator.smtp_port = args.smtp_host, args.smtp_port
+    sender = EmailSender(pool=pool)
+    sender.smtp_server, sender.smtp_port = args.smtp_host, args.smtp_port
+    if args.plain_smtp:
+        sender.credentials = {"email": sender_email, "password": password}
+    elif not args.dry_run:
+        success, message = sender.verify_credentials(sender_email, password)
+        if not success:
+            raise SystemExit(f"Gmail login failed: {message}")
+
+    resume_text = _read_resume(generator, args.resume)
+    jobs: Iterable[Dict[str, object]] = iter_jobs(args.jobs) if args.jobs else []
+    if args.job_description:
+        jobs = itertools.chain([{"id": "cli", "job_description": args.job_description}], jobs)
+    # Campaign ids match the web UI's, so reruns skip recipients either one already reached
+    queue = SendQueue(args.queue_db)
+
+    validator = RecipientValidator(max_workers=args.workers * 4) if args.validate else None
+    delivery = RetryingDelivery(sender, args.retries, args.retry_delay)
+    pipeline = EmailPipeline(generator, delivery, sender_email, queue_size=args.workers * 4,
+                             generate_workers=args.workers, deliver_workers=args.workers,
+                             use_llm=args.personalize)
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output != "-" else sys.stdout
+    writer = ResultWriter(output)
+    import_stats = ImportStats()
+    started = time.perf_counter()
+    try:
+        for job_id, job_description, batch in iter_work(jobs, args.recipients, import_stats):
+            emails = [recipient.email for recipient in batch]
+            if validator:
+                emails, rejected = validator.filter(emails)
+                for result in rejected:
+                    writer.write({"job": job_id, "recipient": result.email, "status": "rejected",
+                                  "message": result.reason})
+            fields = {recipient.email: recipient.fields for recipient in batch}
+
+            campaign_id = campaign_id_for(sender_email, job_description)
+            remaining = []
+            for email in emails:
+                if queue.is_delivered(campaign_id, email):
+                    writer.write({"job": job_id, "recipient": email, "status": "skipped",
+                                  "message": "Already delivered in an earlier run"})
+                else:
+                    remaining.append(email)
+            emails = remaining
+
+            if args.dry_run:
+                for item in pipeline.prepare(job_description, resume_text, emails, fields):
+                    writer.write({"job": job_id, "recipient": item.recipient,
+                                  "status": "failed" if item.error else "drafted",
+                                  "subject": item.subject, "body": item.body, "message": item.error})
+                continue
+
+            queue.create_campaign(campaign_id, sender_email)
+            queue.enqueue(campaign_id, emails)
+
+            def on_result(result, job_id=job_id, campaign_id=campaign_id):
+                # Transient failures are reported once their retries finish
+                if not result.success and delivery.is_deferred(result.recipient):
+                    return
+                queue.record_result(campaign_id, result)
+                writer.write({"job": job_id, "recipient": result.recipient,
+                              "status": "sent" if result.success else "failed",
+                              "message": result.message,
+                              "queued_seconds": round(result.queued_seconds, 4),
+                              "send_seconds": round(result.send_seconds, 4)})
+
+            pipeline.run(job_description, resume_text, emails, fields, on_result=on_result)
+
+            def on_outcome(outcome, job_id=job_id, campaign_id=campaign_id):
+                queue.record_result(campaign_id, SendResult(outcome.recipient, outcome.success, outcome.message))
+                writer.write({"job": job_id, "recipient": outcome.recipient,
+                              "status": "sent" if outcome.success else "failed",
+                              "message": outcome.message,
+                              "attempts": outcome.attempt,
+                              "send_seconds": round(outcome.seconds, 4)})
+
+            delivery.retry(on_outcome)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        pool.close_all()
+        queue.close()
+
+    elapsed = time.perf_counter() - started
+    counts = writer.counts
+    done = counts["sent"] + counts["failed"] + counts["drafted"]
+    report = dict(counts,
+                  rows=import_stats.rows,
+                  invalid=import_stats.invalid,
+                  duplicates=import_stats.duplicates,
+                  seconds=round(elapsed, 2),
+                  per_second=round(done / elapsed, 2) if elapsed else None,
+                  send_p50_ms=round(_percentile(writer.send_seconds, 0.50) * 1000, 1),
+                  send_p95_ms=round(_percentile(writer.send_seconds, 0.95) * 1000, 1),
+                  llm_cache=generator.cache.stats())
+    if args.verbose:
+        report["metrics"] = REGISTRY.snapshot()
+    print(json.dumps(report, indent=2), file=sys.stderr)
+    return 1 if counts["failed"] and not counts["sent"] else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate and send cold emails without the Streamlit UI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    send_parser = commands.add_parser("send", help="generate and deliver emails for a batch of recipients")
+    send_parser.add_argument("--resume", required=True, help="resume file (PDF, DOCX or TXT)")
+    send_parser.add_argument("--jobs", help="JSONL file of jobs: {id, job_description, recipients}")
+    send_parser.add_argument("--job-description", help="job description used for recipients without one")
+    send_parser.add_argument("--recipients", help="CSV or JSONL recipient list (email, name, company, job_description)")
+    send_parser.add_argument("--output", default="results.jsonl", help="JSONL results file, or - for stdout")
+    send_parser.add_argument("--sender", help="Gmail address (default: $GMAIL_ADDRESS)")
+    send_parser.add_argument("--workers", type=int, default=4, help="generation and delivery workers")
+    send_parser.add_argument("--personalize", action="store_true", help="rewrite each opening with the LLM")
+    send_parser.add_argument("--compact", action="store_true",
+                             help="compact the resume and job description to save prompt tokens")
+    send_parser.add_argument("--no-validate", dest="validate", action="store_false",
+                             help="skip MX checks before generation")
+    send_parser.add_argument("--retries", type=int, default=4,
+                             help="attempts per message; transient failures are retried with backoff")
+    send_parser.add_argument("--retry-delay", type=float, default=30.0, help="base retry backoff in seconds")
+    send_parser.add_argument("--queue-db", default="send_queue.db",
+                             help="delivery log; reruns skip recipients it already marks sent")
+    send_parser.add_argument("--dry-run", action="store_true", help="write drafts without sending")
+    send_parser.add_argument("--metrics-port", type=int, help="serve /metrics on this port while running")
+    send_parser.add_argument("--smtp-host", default="smtp.gmail.com")
+    send_parser.add_argument("--smtp-port", type=int, default=587)
+    send_parser.add_argument("--plain-smtp", action="store_true", help="no STARTTLS or login (local test servers)")
+    send_parser.add_argument("--llm-base-url", help="alternative Groq-compatible endpoint")
+    send_parser.add_argument("--verbose", action="store_true", help="include latency histograms in the report")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, force=True)
+    if args.command == "send":
+        return send(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,84 @@
+import hashlib
+import io
 import logging
-from groq import Groq
-import PyPDF2
-from docx import Document
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import smtplib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from message_builder import message_template
+from smtp_pool import get_shared_pool
+from llm_cache import get_shared_cache, make_cache_key
+from llm_scheduler import estimate_tokens, get_shared_scheduler
+from metrics import REGISTRY
+from prompt_compaction import compact_prompt_inputs
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class EmailGenerator:
-    def __init__(self, api_key):
-        self.client = Groq(api_key=api_key)
+    def __init__(self, api_key, pool=None, cache=None, scheduler=None, base_url=None, validator=None,
+                 client=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client = client
         self.model = "llama-3.1-70b-versatile"
         self.gmail_creds = None
+        self.smtp_server = "smtp.gmail.com"
+        self.smtp_port = 587
+        self.pool = pool or get_shared_pool()
+        self.cache = cache or get_shared_cache()
+        self.scheduler = scheduler or get_shared_scheduler()
+        # Optional validation.RecipientValidator consulted before any generation
+        self.validator = validator
+        # Opt-in: compaction trades some resume/JD detail for fewer prompt tokens
+        self.compact_prompts = False
+        self.last_prompt_stats = None
+
+    @property
+    def client(self):
+        """The client passed in, else the process-wide Groq client (groq is imported on first LLM call)"""
+        if self._client is None:
+            self._client = get_shared_client(self.api_key, self.base_url)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
         
-    def read_resume(self, uploaded_file):
-        """Extract text from the uploaded resume file (PDF or DOCX)"""
+    def read_resume(self, uploaded_file, parallel=False):
+        """Extract text from the uploaded resume file (PDF or DOCX).
+
+        Results are memoized by the SHA-256 of the file bytes, so Streamlit
+        reruns with the same upload skip parsing. With ``parallel`` large
+        PDFs are split across a process pool.
+        """
         try:
             file_type = uploaded_file.type if hasattr(uploaded_file, 'type') else uploaded_file.name.split('.')[-1]
+            data = _read_upload_bytes(uploaded_file)
+            digest = hashlib.sha256(data).hexdigest()
+
+            cached = _resume_cache_get(digest)
+            if cached is not None:
+                REGISTRY.inc("resume_cache_hits_total")
+                return cached, None
             
-            if file_type == "application/pdf" or file_type.lower() == 'pdf':
-                reader = PyPDF2.PdfReader(uploaded_file)
-                resume_text = ''
-                for page in reader.pages:
-                    resume_text += page.extract_text()
-            elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document" or file_type.lower() == 'docx':
-                doc = Document(uploaded_file)
-                resume_text = '\n'.join([para.text for para in doc.paragraphs])
-            else:
-                return None, "Unsupported file format. Please upload a PDF or DOCX file."
+            with REGISTRY.timed("resume_parse_seconds"):
+                if file_type == "application/pdf" or file_type.lower() == 'pdf':
+                    resume_text = _extract_pdf_text(data, parallel)
+                elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document" or file_type.lower() == 'docx':
+                    from docx import Document
+                    doc = Document(io.BytesIO(data))
+                    resume_text = '\n'.join([para.text for para in doc.paragraphs])
+                else:
+                    return None, "Unsupported file format. Please upload a PDF or DOCX file."
 
             if not resume_text.strip():
                 return None, "No text could be extracted from the file."
 
-            return resume_text.strip(), None
+            resume_text = resume_text.strip()
+            _resume_cache_put(digest, resume_text)
+            return resume_text, None
         except Exception as e:
             logger.error(f"Error reading resume: {str(e)}")
             return None, f"Error reading the resume: {str(e)}"
@@ -42,18 +86,8 @@ class EmailGenerator:
     def verify_gmail(self, email, password):
         """Verify Gmail credentials"""
         try:
-            logger.info("Attempting to connect to SMTP server...")
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.set_debuglevel(1)
-            
-            logger.info("Starting TLS...")
-            server.starttls()
-            
-            logger.info("Attempting login...")
-            server.login(email, password)
-            
-            logger.info("Closing server connection...")
-            server.quit()
+            logger.info("Verifying Gmail login...")
+            self.pool.verify(self.smtp_server, self.smtp_port, email, password)
             
             self.gmail_creds = {"email": email, "password": password}
             return True
@@ -68,22 +102,13 @@ class EmailGenerator:
             return False, "Gmail credentials not set"
             
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.gmail_creds["email"]
-            msg['To'] = recipient
-            msg['Subject'] = "Test Email From Job Application Assistant"
-            
-            body = "This is a test email to verify the email sending functionality works."
-            msg.attach(MIMEText(body, 'plain'))
-
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.set_debuglevel(1)
-            server.starttls()
-            server.login(self.gmail_creds["email"], self.gmail_creds["password"])
-            
-            text = msg.as_string()
-            server.sendmail(self.gmail_creds["email"], recipient, text)
-            server.quit()
+            with REGISTRY.timed("mime_build_seconds"):
+                subject = "Test Email From Job Application Assistant"
+                body = "This is a test email to verify the email sending functionality works."
+                data = message_template(self.gmail_creds["email"], subject, body).render(recipient)
+            self.pool.sendmail(self.smtp_server, self.smtp_port,
+                               self.gmail_creds["email"], self.gmail_creds["password"],
+                               recipient, data)
             
             return True, "Test email sent successfully!"
             
@@ -91,17 +116,45 @@ class EmailGenerator:
             logger.error(f"Error sending test email: {str(e)}")
             return False, str(e)
 
-    def generate_and_send_email(self, job_description, user_profile, recipient, gmail_creds):
-        """Generate and send email in one step"""
-        if not user_profile:
-            logger.error("User profile/resume is missing")
-            return False, "Missing user profile/resume"
+    def _complete(self, prompt, temperature, max_tokens, validate=None):
+        """Run a chat completion, serving repeated identical requests from cache.
 
-        if not gmail_creds:
-            logger.error("Gmail credentials not set")
-            return False, "Gmail credentials not set"
+        Only replies accepted by ``validate`` are cached (or served from
+        cache), so a malformed completion is retried on the next call.
+        """
+        key = make_cache_key(self.model, prompt, temperature, max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None and (validate is None or validate(cached)):
+            logger.info("Serving completion from cache")
+            REGISTRY.inc("llm_cache_hits_total")
+            return cached
+
+        with REGISTRY.timed("llm_request_seconds"):
+            response = self.scheduler.call(
+                lambda: self.client.chat.completions.create(
+                    messages=[{"role": "user", "content": prompt}],
+                    model=self.model,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                ),
+                tokens=estimate_tokens(prompt) + max_tokens
+            )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            REGISTRY.inc("llm_prompt_tokens_total", usage.prompt_tokens or 0)
+            REGISTRY.inc("llm_completion_tokens_total", usage.completion_tokens or 0)
+        content = response.choices[0].message.content
+        if validate is None or validate(content):
+            self.cache.set(key, content)
+        return content
 
-        prompt = f"""You are an expert email writer for job applications. Generate a compelling email for the following job:
+    def _draft_prompt(self, job_description, user_profile):
+        self.last_prompt_stats = None
+        if self.compact_prompts:
+            job_description, user_profile, self.last_prompt_stats = compact_prompt_inputs(job_description, user_profile)
+            REGISTRY.inc("prompt_input_tokens_before_total", self.last_prompt_stats["tokens_before"])
+            REGISTRY.inc("prompt_input_tokens_after_total", self.last_prompt_stats["tokens_after"])
+        return f"""You are an expert email writer for job applications. Generate a compelling email for the following job:
 
 Job Description: {job_description}
 
@@ -120,6 +173,8 @@ Generate a professional email that:
 9. Keep it under 250 words 
 10. Mention all the social links at the end after the best regards
 
+The same email is sent to several recipients. Address the reader only in the salutation, written exactly as "Dear {{recipient_name}}," with that literal placeholder. Name the hiring company exactly as it appears in the job description.
+
 Format response exactly as:
 SUBJECT: [Your subject line]
 
@@ -127,62 +182,367 @@ SUBJECT: [Your subject line]
 
 ---END---"""
 
-        try:
-            # Generate email content
-            response = self.client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model=self.model,
-                temperature=0.7,
-                max_tokens=1000
-            )
+    def generate_draft(self, job_description, user_profile):
+        """Generate a reusable base draft once per job description and resume"""
+        if not user_profile:
+            logger.error("User profile/resume is missing")
+            return False, "Missing user profile/resume"
 
-            content = response.choices[0].message.content
-            parts = content.split("SUBJECT:", 1)
-            
-            if len(parts) <= 1:
-                return False, "Failed to generate email content"
+        with REGISTRY.timed("prompt_build_seconds"):
+            prompt = self._draft_prompt(job_description, user_profile)
 
-            email_content = parts[1].split("---END---")[0].strip()
-            subject_and_body = email_content.split("\n", 1)
-            
-            if len(subject_and_body) != 2:
+        try:
+            content = self._complete(prompt, temperature=DRAFT_TEMPERATURE, max_tokens=DRAFT_MAX_TOKENS,
+                                     validate=lambda reply: parse_email_content(reply) is not None)
+            parsed = parse_email_content(content)
+            if parsed is None:
                 return False, "Failed to parse email content"
 
-            subject = subject_and_body[0].strip()
-            body = subject_and_body[1].strip()
+            subject, body = parsed
+            return True, {"subject": subject, "body": body}
 
-            # Send email
-            try:
-                msg = MIMEMultipart()
-                msg['From'] = gmail_creds["email"]
-                msg['To'] = recipient
-                msg['Subject'] = subject
-                msg.attach(MIMEText(body, 'plain'))
-
-                logger.info("Connecting to SMTP server...")
-                server = smtplib.SMTP('smtp.gmail.com', 587)
-                server.set_debuglevel(1)
-                
-                server.starttls()
-                server.login(gmail_creds["email"], gmail_creds["password"])
-                
-                logger.info("Sending email...")
-                text = msg.as_string()
-                server.sendmail(gmail_creds["email"], recipient, text)
-                
-                server.quit()
-                logger.info("Email sent successfully!")
-                
-                return True, {
-                    "subject": subject,
-                    "body": body,
-                    "status": "Email sent successfully!"
-                }
+        except Exception as e:
+            logger.error(f"Error generating email: {str(e)}")
+            return False, f"Failed to generate email: {str(e)}"
+
+    def stream_draft(self, job_description, user_profile):
+        """Generate a base draft with streaming output.
+
+        Yields ``{"subject", "body", "done"}`` snapshots as tokens arrive; the
+        subject appears as soon as its line is complete and the stream is
+        closed as soon as ---END--- is seen. The last snapshot has
+        ``done=True``. Raises ValueError if the reply cannot be parsed.
+        """
+        if not user_profile:
+            raise ValueError("Missing user profile/resume")
+
+        with REGISTRY.timed("prompt_build_seconds"):
+            prompt = self._draft_prompt(job_description, user_profile)
+        key = make_cache_key(self.model, prompt, DRAFT_TEMPERATURE, DRAFT_MAX_TOKENS)
+        cached = self.cache.get(key)
+        parser = IncrementalEmailParser()
 
+        if cached is not None:
+            REGISTRY.inc("llm_cache_hits_total")
+            parser.feed(cached)
+        else:
+            started = time.perf_counter()
+            # The in-flight slot stays held while the tokens are read
+            with self.scheduler.stream(
+                lambda: self.client.chat.completions.create(
+                    messages=[{"role": "user", "content": prompt}],
+                    model=self.model,
+                    temperature=DRAFT_TEMPERATURE,
+                    max_tokens=DRAFT_MAX_TOKENS,
+                    stream=True
+                ),
+                tokens=estimate_tokens(prompt) + DRAFT_MAX_TOKENS
+            ) as stream:
+                first_token = True
+                try:
+                    for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        content = chunk.choices[0].delta.content or ""
+                        # Role-only and empty deltas arrive first and carry no tokens
+                        if first_token and content:
+                            first_token = False
+                            REGISTRY.observe("llm_first_token_seconds", time.perf_counter() - started)
+                        if parser.feed(content):
+                            break
+                        if parser.subject is not None:
+                            yield {"subject": parser.subject, "body": parser.body, "done": False}
+                finally:
+                    if hasattr(stream, "close"):
+                        stream.close()
+                    REGISTRY.observe("llm_request_seconds", time.perf_counter() - started)
+                    # Streamed replies carry no usage block, so token counts are estimated
+                    REGISTRY.inc("llm_prompt_tokens_total", estimate_tokens(prompt))
+                    REGISTRY.inc("llm_completion_tokens_total", estimate_tokens(parser.text))
+
+        parsed = parser.result()
+        if parsed is None:
+            raise ValueError("Failed to parse email content")
+        if cached is None:
+            self.cache.set(key, parser.text)
+
+        subject, body = parsed
+        yield {"subject": subject, "body": body, "done": True}
+
+    def personalize_draft(self, draft, recipient, fields=None, use_llm=False):
+        """Fill a base draft's placeholders for one recipient.
+
+        ``fields`` may carry ``recipient_name`` and, for the LLM rewrite,
+        ``company`` and free-form ``notes``. With ``use_llm`` the opening paragraph is additionally
+        rewritten by a short LLM call using those details.
+        """
+        values = recipient_fields(recipient, fields)
+        subject = render_placeholders(draft["subject"], values)
+        body = render_placeholders(draft["body"], values)
+
+        if use_llm:
+            try:
+                body = self._personalize_opening(body, values)
             except Exception as e:
-                logger.error(f"Error sending email: {str(e)}")
-                return False, f"Failed to send email: {str(e)}"
+                logger.warning(f"LLM personalization failed, using template only: {str(e)}")
+
+        return {"subject": subject, "body": body}
+
+    def personalize_drafts(self, draft, recipients, fields=None, use_llm=False):
+        """Personalize a draft for many recipients, running LLM calls concurrently.
+
+        ``fields`` optionally maps each recipient to its placeholder values.
+        Returns a dict of recipient to {"subject", "body"}.
+        """
+        fields = fields or {}
+        if not use_llm:
+            return {recipient: self.personalize_draft(draft, recipient, fields.get(recipient))
+                    for recipient in recipients}
+
+        emails = self.scheduler.map(
+            lambda recipient: self.personalize_draft(draft, recipient, fields.get(recipient), use_llm=True),
+            recipients
+        )
+        return dict(zip(recipients, emails))
+
+    def _personalize_opening(self, body, values):
+        paragraphs = body.split("\n\n")
+        # Skip a salutation line such as "Dear Jane,"
+        index = 1 if len(paragraphs) > 1 and len(paragraphs[0]) < 60 and paragraphs[0].rstrip().endswith(",") else 0
+
+        reader = values["recipient_name"] + (f' at {values["company"]}' if values.get("company") else "")
+        prompt = f"""Rewrite this opening paragraph of a job application email so it speaks directly to {reader}.
+Keep the company named in the paragraph unchanged.
+Additional context: {values.get("notes") or "none"}
+Keep it to at most three sentences. Reply with the paragraph only.
+
+{paragraphs[index]}"""
+
+        opening = self._complete(prompt, temperature=0.7, max_tokens=150, validate=lambda reply: bool(reply.strip())).strip()
+        if opening:
+            paragraphs[index] = opening
+        return "\n\n".join(paragraphs)
+
+    def send_generated_email(self, recipient, subject, body, gmail_creds):
+        """Send an already generated email to a single recipient"""
+        if not gmail_creds:
+            logger.error("Gmail credentials not set")
+            return False, "Gmail credentials not set"
+
+        try:
+            with REGISTRY.timed("mime_build_seconds"):
+                data = message_template(gmail_creds["email"], subject, body).render(recipient)
+
+            logger.info("Sending email...")
+            self.pool.sendmail(self.smtp_server, self.smtp_port,
+                               gmail_creds["email"], gmail_creds["password"],
+                               recipient, data)
+
+            logger.info("Email sent successfully!")
+            return True, "Email sent successfully!"
 
         except Exception as e:
-            logger.error(f"Error generating email: {str(e)}")
-            return False, f"Failed to generate email: {str(e)}"
\ No newline at end of file
+            logger.error(f"Error sending email: {str(e)}")
+            return False, f"Failed to send email: {str(e)}"
+
+    def generate_and_send_email(self, job_description, user_profile, recipient, gmail_creds, draft=None):
+        """Generate and send email in one step.
+
+        Pass a ``draft`` from ``generate_draft`` to skip generation when
+        sending the same job description to several recipients.
+        """
+        if not gmail_creds:
+            logger.error("Gmail credentials not set")
+            return False, "Gmail credentials not set"
+
+        if self.validator:
+            result = self.validator.validate([recipient])[0]
+            if not result.deliverable:
+                logger.error(f"Skipping undeliverable recipient {recipient}: {result.reason}")
+                return False, f"Recipient is not deliverable ({result.reason})"
+
+        if draft is None:
+            success, draft = self.generate_draft(job_description, user_profile)
+            if not success:
+                return False, draft
+
+        email = self.personalize_draft(draft, recipient)
+        success, message = self.send_generated_email(recipient, email["subject"], email["body"], gmail_creds)
+        if not success:
+            return False, message
+
+        return True, {
+            "subject": email["subject"],
+            "body": email["body"],
+            "status": message
+        }
+
+
+DRAFT_TEMPERATURE = 0.7
+DRAFT_MAX_TOKENS = 1000
+
+RESUME_CACHE_SIZE = 32
+
+# Pages per worker below which a process pool costs more than it saves
+PARALLEL_PAGES_PER_WORKER = 8
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_shared_client(api_key, base_url=None):
+    """Return the process-wide Groq client for an API key, importing groq on first use"""
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            from groq import Groq
+            client = Groq(api_key=api_key, base_url=base_url) if base_url else Groq(api_key=api_key)
+            _clients[(api_key, base_url)] = client
+        return client
+
+
+_resume_cache = OrderedDict()
+_resume_cache_lock = threading.Lock()
+
+
+def _resume_cache_get(digest):
+    with _resume_cache_lock:
+        text = _resume_cache.get(digest)
+        if text is not None:
+            _resume_cache.move_to_end(digest)
+        return text
+
+
+def _resume_cache_put(digest, text):
+    with _resume_cache_lock:
+        _resume_cache[digest] = text
+        _resume_cache.move_to_end(digest)
+        while len(_resume_cache) > RESUME_CACHE_SIZE:
+            _resume_cache.popitem(last=False)
+
+
+def _read_upload_bytes(uploaded_file):
+    if hasattr(uploaded_file, 'getvalue'):
+        return uploaded_file.getvalue()
+    data = uploaded_file.read()
+    if hasattr(uploaded_file, 'seek'):
+        uploaded_file.seek(0)
+    return data
+
+
+def _extract_pdf_pages(data, start, stop):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+def _extract_pdf_text(data, parallel=False):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+    workers = min(os.cpu_count() or 1, page_count // PARALLEL_PAGES_PER_WORKER)
+
+    if not parallel or workers < 2:
+        return ''.join(page.extract_text() or '' for page in reader.pages)
+
+    chunk = -(-page_count // workers)
+    ranges = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(_extract_pdf_pages, [data] * len(ranges), *zip(*ranges))
+        return ''.join(text for pages in chunks for text in pages)
+
+
+PLACEHOLDER_DEFAULTS = {
+    "recipient_name": "Hiring Manager",
+}
+
+# Only the salutation is templated; the company comes from the job description
+_PLACEHOLDER_RE = re.compile(r"\{(recipient_name)\}")
+
+
+def parse_email_content(content):
+    """Split an LLM reply into (subject, body), or return None if malformed"""
+    parts = content.split("SUBJECT:", 1)
+    if len(parts) <= 1:
+        return None
+
+    email_content = parts[1].split("---END---")[0].strip()
+    subject_and_body = email_content.split("\n", 1)
+    if len(subject_and_body) != 2:
+        return None
+
+    return subject_and_body[0].strip(), subject_and_body[1].strip()
+
+
+class IncrementalEmailParser:
+    """Parse a streamed "SUBJECT: ... ---END---" reply as chunks arrive"""
+
+    SUBJECT_MARKER = "SUBJECT:"
+    END_MARKER = "---END---"
+
+    def __init__(self):
+        self.text = ""
+        self.subject = None
+        self.done = False
+        self._body_start = None
+        self._body_end = None
+
+    def feed(self, chunk):
+        """Append a chunk; returns True once the end marker has been seen"""
+        if self.done:
+            return True
+        scan_from = max(0, len(self.text) - len(self.END_MARKER))
+        self.text += chunk
+
+        if self.subject is None:
+            marker = self.text.find(self.SUBJECT_MARKER)
+            if marker == -1:
+                return False
+            line_end = self.text.find("\n", marker)
+            if line_end == -1:
+                return False
+            self.subject = self.text[marker + len(self.SUBJECT_MARKER):line_end].strip()
+            self._body_start = line_end + 1
+            scan_from = self._body_start
+
+        end = self.text.find(self.END_MARKER, max(scan_from, self._body_start))
+        if end != -1:
+            self._body_end = end
+            self.done = True
+        return self.done
+
+    @property
+    def body(self):
+        """Body text received so far, holding back a possibly partial end marker"""
+        if self.subject is None:
+            return ""
+        end = self._body_end if self.done else max(self._body_start, len(self.text) - len(self.END_MARKER) + 1)
+        return self.text[self._body_start:end].strip()
+
+    def result(self):
+        """Return (subject, body) once the reply has ended, or None if malformed"""
+        if self.subject is None:
+            return None
+        body = self.text[self._body_start:self._body_end].strip()
+        if not body:
+            return None
+        return self.subject, body
+
+
+def recipient_fields(recipient, fields=None):
+    """
+    Resolve placeholder values for a recipient from imported fields,
+    falling back to defaults. Nothing is guessed from the address: a
+    recruiter's or webmail domain says nothing about the hiring company.
+    """
+    values = dict(PLACEHOLDER_DEFAULTS)
+    for key, value in (fields or {}).items():
+        if value:
+            values[key] = value
+    return values
+
+
+def render_placeholders(text, values):
+    """Substitute known {placeholder} slots, leaving any other braces untouched"""
+    return _PLACEHOLDER_RE.sub(lambda m: str(values.get(m.group(1), m.group(0))), text)
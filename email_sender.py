@@ -1,19 +1,26 @@
 # email_sender.py
 
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import smtplib
-from typing import Dict, Tuple, Optional
+import time
+from typing import Callable, Dict, List, Tuple, Optional
+from bulk_sender import BulkSender, SendJob, SendResult, get_account_limiter
+from message_builder import BCC_BATCH_SIZE, bcc_batches, message_template
+from outcomes import (AUTH, PERMANENT, TRANSIENT, DeliveryOutcome, OutcomeStore, RetryScheduler,
+                      classify_failure, get_shared_outcome_store, message_key)
+from smtp_pool import SMTPConnectionPool, get_shared_pool
+from metrics import REGISTRY
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class EmailSender:
-    def __init__(self):
+    def __init__(self, pool: Optional[SMTPConnectionPool] = None, outcomes: Optional[OutcomeStore] = None):
         self.smtp_server = "smtp.gmail.com"
         self.smtp_port = 587
         self.credentials: Optional[Dict[str, str]] = None
+        self.pool = pool or get_shared_pool()
+        self.outcomes = outcomes or get_shared_outcome_store()
         
     def verify_credentials(self, email: str, password: str) -> Tuple[bool, str]:
         """
@@ -23,11 +30,7 @@ class EmailSender:
             Tuple[bool, str]: (success status, message)
         """
         try:
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.set_debuglevel(1)
-            server.starttls()
-            server.login(email, password)
-            server.quit()
+            self.pool.verify(self.smtp_server, self.smtp_port, email, password)
             
             self.credentials = {"email": email, "password": password}
             logger.info("Gmail credentials verified successfully")
@@ -52,6 +55,46 @@ class EmailSender:
         
         return self.send_email(recipient, subject, body)
     
+    def deliver(self, recipient: str, subject: str, body: str):
+        """
+        Build and send one email, raising the underlying smtplib error on
+        failure so callers can inspect SMTP reply codes
+        """
+        # Render the shared body once, then address it to this recipient
+        with REGISTRY.timed("mime_build_seconds"):
+            data = message_template(self.credentials["email"], subject, body).render(recipient)
+        
+        # Send email over a pooled session
+        logger.info("Sending email...")
+        self.pool.sendmail(self.smtp_server, self.smtp_port,
+                           self.credentials["email"], self.credentials["password"],
+                           recipient, data)
+            
+    def attempt(self, recipient: str, subject: str, body: str) -> DeliveryOutcome:
+        """
+        Make one delivery attempt and record its reply code, failure class
+        and timing in the outcome store
+        
+        Returns:
+            DeliveryOutcome: the recorded attempt
+        """
+        if not self.credentials:
+            return DeliveryOutcome(recipient, "", False, "Credentials not set. Please verify credentials first.",
+                                   failure_class=AUTH)
+            
+        started = time.time()
+        outcome = DeliveryOutcome(recipient, self.credentials["email"], True, "Email sent successfully!",
+                                  started=started, message_key=message_key(subject, body))
+        try:
+            self.deliver(recipient, subject, body)
+        except Exception as e:
+            outcome.success = False
+            outcome.code, outcome.failure_class = classify_failure(e)
+            outcome.message = str(e)
+            logger.error(f"Failed to send email: {str(e)}")
+        outcome.seconds = time.time() - started
+        return self.outcomes.record(outcome)
+            
     def send_email(self, recipient: str, subject: str, body: str) -> Tuple[bool, str]:
         """
         Send an email using the verified Gmail credentials
@@ -62,49 +105,117 @@ class EmailSender:
         if not self.credentials:
             return False, "Credentials not set. Please verify credentials first."
             
-        try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.credentials["email"]
-            msg['To'] = recipient
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'plain'))
-            
-            # Establish connection
-            logger.info("Connecting to SMTP server...")
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.set_debuglevel(1)
+        outcome = self.attempt(recipient, subject, body)
+        if not outcome.success:
+            return False, f"Failed to send email: {outcome.message}"
+        return True, outcome.message
             
-            logger.info("Starting TLS...")
-            server.starttls()
+    def retry_scheduler(self, max_attempts: int = 4, base_delay: float = 30.0,
+                        per_domain: int = 2) -> RetryScheduler:
+        """
+        Returns:
+            RetryScheduler: delivers through ``attempt`` within this account's
+            rate limits, retrying transient failures
+        """
+        limiter = get_account_limiter(self.credentials["email"]) if self.credentials else None
+        return RetryScheduler(self.attempt, max_attempts=max_attempts, base_delay=base_delay,
+                              per_domain=per_domain, max_workers=self.pool.max_sessions, limiter=limiter)
             
-            logger.info("Logging in...")
-            server.login(self.credentials["email"], self.credentials["password"])
+    def send_with_retries(self, jobs: List[SendJob], max_attempts: int = 4, base_delay: float = 30.0,
+                          per_domain: int = 2, on_outcome: Optional[Callable[[DeliveryOutcome], None]] = None,
+                          previous_attempts: int = 0) -> List[DeliveryOutcome]:
+        """
+        Send individually addressed emails, retrying only transient
+        failures (421, timeouts, dropped connections) with backoff and at
+        most ``per_domain`` concurrent sends per recipient domain
+        
+        Returns:
+            List[DeliveryOutcome]: final attempt per job, in job order
+        """
+        scheduler = self.retry_scheduler(max_attempts=max_attempts, base_delay=base_delay, per_domain=per_domain)
+        return scheduler.run(jobs, on_outcome=on_outcome, previous_attempts=previous_attempts)
             
-            # Send email
-            logger.info("Sending email...")
-            text = msg.as_string()
-            server.sendmail(self.credentials["email"], recipient, text)
+    def send_bulk_jobs(self, jobs: List[SendJob], max_workers: Optional[int] = None) -> List[SendResult]:
+        """
+        Send individually addressed emails concurrently, honouring the
+        account's rate limits
+        
+        Returns:
+            List[SendResult]: Per-recipient outcome and timings, in job order
+        """
+        if not self.credentials:
+            return [SendResult(job.recipient, False, "Credentials not set. Please verify credentials first.")
+                    for job in jobs]
             
-            logger.info("Closing connection...")
-            server.quit()
+        sender = BulkSender(self.send_email, self.credentials["email"],
+                            max_workers=max_workers or self.pool.max_sessions)
+        return sender.send(jobs)
             
-            return True, "Email sent successfully!"
+    def send_bcc_batch(self, recipients: List[str], subject: str, body: str) -> Dict[str, bool]:
+        """
+        Send one message to a batch of blind-copied recipients in a single
+        SMTP transaction. Recipients never see each other's addresses.
+        
+        Returns:
+            Dict[str, bool]: Dictionary mapping recipient emails to success status
+        """
+        if not self.credentials:
+            return {recipient: False for recipient in recipients}
             
+        with REGISTRY.timed("mime_build_seconds"):
+            data = message_template(self.credentials["email"], subject, body).render_bcc()
+        started = time.time()
+        key = message_key(subject, body)
+        try:
+            refused = self.pool.sendmail(self.smtp_server, self.smtp_port,
+                                         self.credentials["email"], self.credentials["password"],
+                                         recipients, data)
+            failure = None
+        except smtplib.SMTPRecipientsRefused as e:
+            refused, failure = e.recipients, None
         except Exception as e:
-            error_msg = f"Failed to send email: {str(e)}"
-            logger.error(error_msg)
-            return False, error_msg
+            logger.error(f"Failed to send BCC batch of {len(recipients)}: {str(e)}")
+            refused, failure = {}, e
             
-    def send_bulk_emails(self, recipients: list, subject: str, body: str) -> Dict[str, bool]:
+        seconds = time.time() - started
+        outcome = {}
+        for recipient in recipients:
+            record = DeliveryOutcome(recipient, self.credentials["email"], True, "Email sent successfully!",
+                                     seconds=seconds, started=started, message_key=key)
+            if failure is not None:
+                record.success = False
+                record.code, record.failure_class = classify_failure(failure)
+                record.message = str(failure)
+            elif recipient in refused:
+                code, reply = refused[recipient]
+                record.success, record.code = False, code
+                record.failure_class = TRANSIENT if 400 <= code < 500 else PERMANENT
+                record.message = f"{code} {reply.decode('utf-8', 'replace') if isinstance(reply, bytes) else reply}"
+            self.outcomes.record(record)
+            outcome[recipient] = record.success
+        return outcome
+            
+    def send_bulk_emails(self, recipients: list, subject: str, body: str, bcc: bool = False) -> Dict[str, bool]:
         """
         Send the same email to multiple recipients
         
+        With ``bcc=True`` recipients are blind-copied in batches of
+        BCC_BATCH_SIZE, one SMTP transaction per batch, instead of one
+        individually addressed message each.
+        
         Returns:
             Dict[str, bool]: Dictionary mapping recipient emails to success status
         """
-        results = {}
-        for recipient in recipients:
-            success, _ = self.send_email(recipient, subject, body)
-            results[recipient] = success
-        return results
\ No newline at end of file
+        if bcc and self.credentials:
+            limiter = get_account_limiter(self.credentials["email"])
+            outcome = {}
+            for batch in bcc_batches(list(recipients), BCC_BATCH_SIZE):
+                # Quotas count recipients, not transactions
+                if not limiter.acquire(max_wait=120, amount=len(batch)):
+                    outcome.update({recipient: False for recipient in batch})
+                    continue
+                outcome.update(self.send_bcc_batch(batch, subject, body))
+            return outcome
+            
+        results = self.send_bulk_jobs([SendJob(recipient, subject, body) for recipient in recipients])
+        return {result.recipient: result.success for result in results}
\ No newline at end of file
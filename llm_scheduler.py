@@ -0,0 +1,148 @@
+# llm_scheduler.py
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
+
+from bulk_sender import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Exception class names raised by the groq/openai SDKs for network-level failures
+_TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "InternalServerError", "RateLimitError"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return max(1, len(text) // 4)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """True for rate limits, server errors and connection failures worth retrying"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in _TRANSIENT_ERROR_NAMES or isinstance(error, (ConnectionError, TimeoutError))
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read a Retry-After header (in seconds) from an SDK error, if present"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class GenerationScheduler:
+    """
+    Runs LLM calls with a cap on in-flight requests, a requests-per-minute
+    and tokens-per-minute budget, and exponential backoff with full jitter
+    on transient failures (honouring Retry-After when the API sends it).
+    """
+
+    def __init__(self, max_in_flight: int = 4, requests_per_minute: int = 30,
+                 tokens_per_minute: int = 6000, max_retries: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 30.0):
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._budget_lock = threading.Lock()
+        self._requests = TokenBucket(requests_per_minute / 60.0, requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+
+    def _reserve(self, tokens: int):
+        while True:
+            with self._budget_lock:
+                wait = max(self._requests.wait_time(), self._tokens.wait_time(tokens))
+                if wait == 0:
+                    self._requests.consume()
+                    self._tokens.consume(tokens)
+                    return
+            time.sleep(wait)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _acquire(self, fn: Callable[[], R], tokens: int) -> R:
+        """Run ``fn`` with retries; on success the caller owns the in-flight slot and must release it"""
+        attempt = 0
+        while True:
+            self._reserve(tokens)
+            self._slots.acquire()
+            try:
+                return fn()
+            except Exception as e:
+                self._slots.release()
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning(f"Transient LLM error ({str(e)}), retry {attempt + 1} in {delay:.1f}s")
+            except BaseException:
+                self._slots.release()
+                raise
+            attempt += 1
+            time.sleep(delay)
+
+    def call(self, fn: Callable[[], R], tokens: int = 1) -> R:
+        """
+        Run one LLM call within the budget, retrying transient failures.
+
+        ``tokens`` is the estimated prompt plus completion size charged
+        against the tokens-per-minute budget.
+        """
+        result = self._acquire(fn, tokens)
+        self._slots.release()
+        return result
+
+    @contextmanager
+    def stream(self, fn: Callable[[], R], tokens: int = 1) -> Iterator[R]:
+        """
+        Like ``call`` for streaming requests: the in-flight slot is held until
+        the block exits, so reading the tokens counts against ``max_in_flight``.
+        """
+        result = self._acquire(fn, tokens)
+        try:
+            yield result
+        finally:
+            self._slots.release()
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T]) -> List[R]:
+        """
+        Apply ``fn`` to every item concurrently. ``fn`` is expected to route
+        its LLM calls through ``call`` so the budget applies.
+
+        Returns:
+            List[R]: results in input order; exceptions propagate
+        """
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            return list(executor.map(fn, items))
+
+
+_shared_scheduler: Optional[GenerationScheduler] = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_shared_scheduler() -> GenerationScheduler:
+    """Return the process-wide scheduler, since the Groq quota is shared by every session"""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = GenerationScheduler()
+        return _shared_scheduler
@@ -0,0 +1,65 @@
+# message_builder.py
+
+import functools
+import logging
+from email import policy
+from email.message import EmailMessage
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Gmail accepts up to 100 recipients per message; stay well below it
+BCC_BATCH_SIZE = 50
+
+# 7-bit safe transfer encodings, so servers without 8BITMIME accept the bytes as-is
+_POLICY = policy.SMTP.clone(cte_type="7bit")
+
+
+def build_message(sender: str, recipient: Optional[str], subject: str, body: str) -> EmailMessage:
+    """Plain-text message with the modern EmailMessage API"""
+    msg = EmailMessage(policy=_POLICY)
+    msg['From'] = sender
+    if recipient:
+        msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.set_content(body)
+    return msg
+
+
+class MessageTemplate:
+    """
+    A message rendered once and re-addressed per recipient.
+
+    The sender, subject, MIME headers and encoded body are serialized to
+    bytes up front; ``render`` only prepends a folded ``To`` header, so
+    sending the same email to many recipients costs one serialization.
+    """
+
+    def __init__(self, sender: str, subject: str, body: str):
+        self.sender = sender
+        self._rendered = build_message(sender, None, subject, body).as_bytes()
+
+    def render(self, recipient: str) -> bytes:
+        """
+        Returns:
+            bytes: the full message addressed to ``recipient``
+        """
+        return _POLICY.fold_binary("To", recipient) + self._rendered
+
+    def render_bcc(self) -> bytes:
+        """
+        Returns:
+            bytes: the message addressed to the sender only, for delivery
+            to a batch of blind-copied recipients in one transaction
+        """
+        return self.render(self.sender)
+
+
+@functools.lru_cache(maxsize=128)
+def message_template(sender: str, subject: str, body: str) -> MessageTemplate:
+    """Shared, cached template for a (sender, subject, body) triple"""
+    return MessageTemplate(sender, subject, body)
+
+
+def bcc_batches(recipients: List[str], batch_size: int = BCC_BATCH_SIZE) -> List[List[str]]:
+    return [recipients[i:i + batch_size] for i in range(0, len(recipients), batch_size)]
@@ -0,0 +1,345 @@
+# outcomes.py
+
+import hashlib
+import heapq
+import itertools
+import logging
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from bulk_sender import AccountRateLimiter, SendJob, UnlimitedRateLimiter
+from smtp_pool import SMTPDeliveryUnknown
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+AUTH = "auth"
+FAILURE_CLASSES = (TRANSIENT, PERMANENT, AUTH)
+
+AUTH_CODES = {530, 534, 535}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outcomes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    message_key TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    success INTEGER NOT NULL,
+    code INTEGER,
+    failure_class TEXT,
+    message TEXT,
+    started REAL NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outcomes_message ON outcomes (sender, recipient, message_key);
+CREATE INDEX IF NOT EXISTS outcomes_started ON outcomes (started);
+"""
+
+_COLUMNS = "recipient, sender, success, message, code, failure_class, attempt, seconds, started, message_key"
+
+
+@dataclass
+class DeliveryOutcome:
+    recipient: str
+    sender: str
+    success: bool
+    message: str
+    code: Optional[int] = None
+    failure_class: Optional[str] = None
+    attempt: int = 0
+    seconds: float = 0.0
+    started: float = 0.0
+    message_key: str = ""
+
+
+AttemptFunction = Callable[[str, str, str], DeliveryOutcome]
+
+
+def smtp_error_code(error: Exception) -> Optional[int]:
+    """Best-effort SMTP reply code for an smtplib exception"""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code
+    if isinstance(error, smtplib.SMTPRecipientsRefused) and error.recipients:
+        return next(iter(error.recipients.values()))[0]
+    return None
+
+
+def classify_failure(error: Exception) -> Tuple[Optional[int], str]:
+    """
+    Classify a send error as transient (worth retrying later), permanent
+    (the recipient or message will never be accepted) or auth (the
+    sending account itself is rejected).
+
+    Returns:
+        Tuple[Optional[int], str]: (SMTP reply code if any, failure class)
+    """
+    code = smtp_error_code(error)
+    # The message may already be delivered; retrying could send it twice
+    if isinstance(error, SMTPDeliveryUnknown):
+        return code, PERMANENT
+    if isinstance(error, smtplib.SMTPAuthenticationError) or code in AUTH_CODES:
+        return code, AUTH
+    if code is not None and code > 0:
+        return code, PERMANENT if code >= 500 else TRANSIENT
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return code, TRANSIENT
+    if isinstance(error, smtplib.SMTPException):
+        return code, PERMANENT
+    # Socket-level failures: timeouts, refused or reset connections
+    if isinstance(error, OSError):
+        return code, TRANSIENT
+    return code, PERMANENT
+
+
+def message_key(subject: str, body: str) -> str:
+    return hashlib.sha256(f"{subject}\n{body}".encode("utf-8")).hexdigest()[:16]
+
+
+class OutcomeStore:
+    """
+    Append-only SQLite (WAL mode) log of every delivery attempt: reply
+    code, failure class, timing and attempt number per recipient and
+    message. Attempt numbers are assigned on insert, per (sender,
+    recipient, message).
+    """
+
+    def __init__(self, db_path: str = "send_outcomes.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def record(self, outcome: DeliveryOutcome) -> DeliveryOutcome:
+        """Append an attempt, filling in its attempt number"""
+        domain = outcome.recipient.rsplit("@", 1)[-1].lower()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT COALESCE(MAX(attempt), 0) + 1 FROM outcomes "
+                "WHERE sender = ? AND recipient = ? AND message_key = ?",
+                (outcome.sender, outcome.recipient, outcome.message_key)
+            ).fetchone()
+            outcome.attempt = row[0]
+            self._db.execute(
+                "INSERT INTO outcomes (sender, recipient, domain, message_key, attempt, success, code, "
+                "failure_class, message, started, seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (outcome.sender, outcome.recipient, domain, outcome.message_key, outcome.attempt,
+                 int(outcome.success), outcome.code, outcome.failure_class, outcome.message,
+                 outcome.started, outcome.seconds)
+            )
+        return outcome
+
+    def latest(self, recipients: Iterable[str], sender: Optional[str] = None) -> Dict[str, DeliveryOutcome]:
+        """
+        Returns:
+            Dict[str, DeliveryOutcome]: most recent attempt per recipient,
+            from any sender unless ``sender`` is given
+        """
+        recipients = list(recipients)
+        latest = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(recipients), 500):
+            chunk = recipients[start:start + 500]
+            query = (f"SELECT MAX(id) FROM outcomes WHERE recipient IN ({', '.join('?' * len(chunk))})"
+                     + (" AND sender = ?" if sender else "") + " GROUP BY recipient")
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT {_COLUMNS} FROM outcomes WHERE id IN ({query})",
+                    chunk + ([sender] if sender else [])
+                ).fetchall()
+            for row in rows:
+                latest[row[0]] = _outcome(row)
+        return latest
+
+    def history(self, since: float = 0.0, sender: Optional[str] = None,
+                limit: int = 1000) -> List[DeliveryOutcome]:
+        """
+        Returns:
+            List[DeliveryOutcome]: attempts started at or after ``since``, newest first
+        """
+        query = f"SELECT {_COLUMNS} FROM outcomes WHERE started >= ?"
+        params: list = [since]
+        if sender:
+            query += " AND sender = ?"
+            params.append(sender)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [_outcome(row) for row in rows]
+
+    def throughput(self, since: float = 0.0, sender: Optional[str] = None) -> Dict[str, object]:
+        """
+        Returns:
+            Dict[str, object]: attempts, sent and failed counts, failures per
+            class, sends per second over the window and mean send seconds
+        """
+        where = "WHERE started >= ?" + (" AND sender = ?" if sender else "")
+        params = [since] + ([sender] if sender else [])
+        with self._lock:
+            attempts, sent, first, last, mean = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(success), 0), MIN(started), MAX(started + seconds), AVG(seconds) "
+                f"FROM outcomes {where}", params
+            ).fetchone()
+            by_class = dict(self._db.execute(
+                f"SELECT failure_class, COUNT(*) FROM outcomes {where} AND success = 0 GROUP BY failure_class",
+                params
+            ).fetchall())
+        window = (last - first) if attempts else 0.0
+        report = {
+            "attempts": attempts,
+            "sent": sent,
+            "failed": attempts - sent,
+            "per_second": round(sent / window, 2) if window else None,
+            "mean_seconds": round(mean, 4) if mean is not None else None,
+        }
+        report.update({failure_class: by_class.get(failure_class, 0) for failure_class in FAILURE_CLASSES})
+        return report
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _outcome(row) -> DeliveryOutcome:
+    outcome = DeliveryOutcome(*row)
+    outcome.success = bool(outcome.success)
+    return outcome
+
+
+class RetryScheduler:
+    """
+    Deliver jobs through ``attempt_fn`` (for example EmailSender.attempt),
+    retrying only transient failures with jittered exponential backoff.
+
+    Waiting retries sit in a timer heap rather than holding a worker, and
+    at most ``per_domain`` attempts to the same recipient domain run at
+    once. Permanent failures are final; an auth failure stops the run,
+    since every later send from the account would fail the same way.
+    """
+
+    def __init__(self, attempt_fn: AttemptFunction, max_attempts: int = 4, base_delay: float = 30.0,
+                 max_delay: float = 900.0, per_domain: int = 2, max_workers: int = 4,
+                 limiter: Optional[AccountRateLimiter] = None, max_wait: float = 120.0):
+        self.attempt_fn = attempt_fn
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.per_domain = per_domain
+        self.max_workers = max_workers
+        self.limiter = limiter or UnlimitedRateLimiter()
+        self.max_wait = max_wait
+
+    def _attempt(self, job: SendJob) -> DeliveryOutcome:
+        if not self.limiter.acquire(max_wait=self.max_wait):
+            return DeliveryOutcome(job.recipient, "", False, "Rate limit reached; will retry",
+                                   failure_class=TRANSIENT)
+        return self.attempt_fn(job.recipient, job.subject, job.body)
+
+    def backoff(self, attempt: int) -> float:
+        """Jittered delay before the attempt after ``attempt`` failed ones"""
+        return min(self.max_delay, self.base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    def run(self, jobs: Iterable[SendJob],
+            on_outcome: Optional[Callable[[DeliveryOutcome], None]] = None,
+            previous_attempts: int = 0, defer_retries: bool = False) -> List[DeliveryOutcome]:
+        """
+        Deliver ``jobs``; with ``previous_attempts`` the jobs have already
+        failed that many times and the first attempt waits out the backoff.
+        With ``defer_retries`` every job gets a single attempt and transient
+        failures are reported as they are, for callers that requeue them
+        (see ``backoff``) rather than wait here.
+
+        Returns:
+            List[DeliveryOutcome]: final outcome per job, in job order
+        """
+        jobs = list(jobs)
+        final: List[Optional[DeliveryOutcome]] = [None] * len(jobs)
+        attempts = [previous_attempts] * len(jobs)
+        counter = itertools.count()
+        first = time.monotonic() + self.backoff(previous_attempts) if previous_attempts else 0.0
+        due = [(first, next(counter), index) for index in range(len(jobs))]
+        heapq.heapify(due)
+        busy: Dict[str, int] = {}
+        running = {}
+        auth_failure: Optional[DeliveryOutcome] = None
+
+        def finish(index: int, outcome: DeliveryOutcome):
+            final[index] = outcome
+            if on_outcome:
+                on_outcome(outcome)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while due or running:
+                now = time.monotonic()
+                deferred = []
+                while due and due[0][0] <= now and len(running) < self.max_workers and auth_failure is None:
+                    entry = heapq.heappop(due)
+                    job = jobs[entry[2]]
+                    domain = job.recipient.rsplit("@", 1)[-1].lower()
+                    if busy.get(domain, 0) >= self.per_domain:
+                        deferred.append(entry)
+                        continue
+                    busy[domain] = busy.get(domain, 0) + 1
+                    attempts[entry[2]] += 1
+                    running[executor.submit(self._attempt, job)] = (entry[2], domain)
+                for entry in deferred:
+                    heapq.heappush(due, entry)
+
+                if auth_failure is not None and not running:
+                    for _, _, index in due:
+                        finish(index, DeliveryOutcome(jobs[index].recipient, auth_failure.sender, False,
+                                                      f"Skipped after authentication failure: {auth_failure.message}",
+                                                      auth_failure.code, AUTH))
+                    due = []
+                    break
+
+                timeout = None
+                if due and len(running) < self.max_workers and not deferred and auth_failure is None:
+                    timeout = max(0.0, due[0][0] - time.monotonic())
+                if not running:
+                    time.sleep(timeout or 0.0)
+                    continue
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    index, domain = running.pop(future)
+                    busy[domain] -= 1
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        code, failure_class = classify_failure(e)
+                        outcome = DeliveryOutcome(jobs[index].recipient, "", False, str(e), code, failure_class)
+                    if outcome.failure_class == AUTH and auth_failure is None:
+                        logger.error(f"Authentication failed, stopping retries: {outcome.message}")
+                        auth_failure = outcome
+                    if (not outcome.success and outcome.failure_class == TRANSIENT and not defer_retries
+                            and attempts[index] < self.max_attempts and auth_failure is None):
+                        delay = self.backoff(attempts[index])
+                        logger.info(f"Retrying {outcome.recipient} in {delay:.0f}s after: {outcome.message}")
+                        heapq.heappush(due, (time.monotonic() + delay, next(counter), index))
+                    else:
+                        finish(index, outcome)
+        return final
+
+
+_shared_store: Optional[OutcomeStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_outcome_store() -> OutcomeStore:
+    """Return the process-wide outcome store, opening it on first use"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = OutcomeStore()
+        return _shared_store
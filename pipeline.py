@@ -0,0 +1,205 @@
+# pipeline.py
+
+import logging
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+from bulk_sender import BulkSender, SendFunction, SendJob, SendResult
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class PipelineItem:
+    recipient: str
+    fields: Dict[str, str] = field(default_factory=dict)
+    subject: str = ""
+    body: str = ""
+    error: Optional[str] = None
+
+
+def _start_stage(name: str, fn: Callable[[PipelineItem], Optional[PipelineItem]],
+                 inbox: queue.Queue, outbox: queue.Queue, workers: int) -> List[threading.Thread]:
+    """
+    Run ``fn`` over every item from ``inbox`` on ``workers`` threads and
+    forward results to ``outbox``. Items that already carry an error are
+    passed through untouched; ``fn`` may return None to drop an item.
+    """
+    remaining = [workers]
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                inbox.put(_DONE)
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        outbox.put(_DONE)
+                return
+            if item.error is None:
+                try:
+                    item = fn(item)
+                except Exception as e:
+                    logger.error(f"{name} stage failed for {item.recipient}: {str(e)}")
+                    item.error = str(e)
+            if item is not None:
+                outbox.put(item)
+
+    threads = [threading.Thread(target=work, daemon=True, name=f"{name}-{i}") for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+class EmailPipeline:
+    """
+    Staged generate -> render -> (approve) -> deliver pipeline.
+
+    Stages run on their own threads and are connected by bounded queues, so
+    generation for one recipient overlaps delivery to another while memory
+    stays bounded by ``queue_size``. Delivery goes through ``send_fn`` (for
+    example EmailSender.send_email), which shares the pooled SMTP sessions.
+    """
+
+    def __init__(self, generator, send_fn: SendFunction, account: str,
+                 queue_size: int = 16, generate_workers: int = 4, deliver_workers: int = 4,
+                 use_llm: bool = False):
+        self.generator = generator
+        self.send_fn = send_fn
+        self.account = account
+        self.queue_size = queue_size
+        self.generate_workers = generate_workers
+        self.deliver_workers = deliver_workers
+        self.use_llm = use_llm
+        self._draft = None
+        self._draft_lock = threading.Lock()
+        self._feed_error: Optional[BaseException] = None
+
+    def _base_draft(self, job_description: str, user_profile: str) -> dict:
+        with self._draft_lock:
+            if self._draft is None:
+                success, draft = self.generator.generate_draft(job_description, user_profile)
+                # A failed draft is remembered too, so it fails every item without retrying
+                self._draft = (success, draft)
+            success, draft = self._draft
+            if not success:
+                raise RuntimeError(draft)
+            return draft
+
+    def _generate(self, job_description: str, user_profile: str):
+        def stage(item: PipelineItem) -> PipelineItem:
+            draft = self._base_draft(job_description, user_profile)
+            if self.use_llm:
+                email = self.generator.personalize_draft(draft, item.recipient, item.fields, use_llm=True)
+            else:
+                email = draft
+            item.subject, item.body = email["subject"], email["body"]
+            return item
+        return stage
+
+    def _render(self, item: PipelineItem) -> PipelineItem:
+        email = self.generator.personalize_draft(
+            {"subject": item.subject, "body": item.body}, item.recipient, item.fields
+        )
+        item.subject, item.body = email["subject"], email["body"]
+        return item
+
+    def _feed(self, inbox: queue.Queue, recipients: Iterable[str], fields: Dict[str, Dict[str, str]]):
+        try:
+            for recipient in recipients:
+                inbox.put(PipelineItem(recipient, dict(fields.get(recipient) or {})))
+        except BaseException as e:
+            logger.error(f"Reading recipients failed: {str(e)}")
+            self._feed_error = e
+        finally:
+            # Always terminate the stages, or the caller would wait forever
+            inbox.put(_DONE)
+
+    def _raise_feed_error(self):
+        """Re-raise in the caller's thread an error from the recipients iterable"""
+        error, self._feed_error = self._feed_error, None
+        if error is not None:
+            raise error
+
+    def _start(self, job_description: str, user_profile: str, recipients: Iterable[str],
+               fields: Optional[Dict[str, Dict[str, str]]],
+               approve_fn: Optional[Callable[[PipelineItem], bool]]) -> queue.Queue:
+        self._draft = None
+        self._feed_error = None
+        inbox = queue.Queue(self.queue_size)
+        generated = queue.Queue(self.queue_size)
+        rendered = queue.Queue(self.queue_size)
+
+        threading.Thread(target=self._feed, args=(inbox, recipients, fields or {}), daemon=True).start()
+        _start_stage("generate", self._generate(job_description, user_profile), inbox, generated,
+                     self.generate_workers)
+        _start_stage("render", self._render, generated, rendered, 1)
+        if approve_fn is None:
+            return rendered
+
+        approved = queue.Queue(self.queue_size)
+        _start_stage("approve", lambda item: item if approve_fn(item) else None, rendered, approved, 1)
+        return approved
+
+    @staticmethod
+    def _drain(outbox: queue.Queue) -> Iterable[PipelineItem]:
+        while True:
+            item = outbox.get()
+            if item is _DONE:
+                return
+            yield item
+
+    def prepare(self, job_description: str, user_profile: str, recipients: Iterable[str],
+                fields: Optional[Dict[str, Dict[str, str]]] = None) -> List[PipelineItem]:
+        """Run only the generate and render stages, returning drafts for review"""
+        items = list(self._drain(self._start(job_description, user_profile, recipients, fields, None)))
+        self._raise_feed_error()
+        return items
+
+    def deliver(self, items: Iterable[PipelineItem],
+                on_result: Optional[Callable[[SendResult], None]] = None) -> List[SendResult]:
+        """Send already rendered (e.g. approved) items"""
+        results = []
+        jobs = []
+        for item in items:
+            if item.error is not None:
+                results.append(SendResult(item.recipient, False, item.error))
+                if on_result:
+                    on_result(results[-1])
+            else:
+                jobs.append(SendJob(item.recipient, item.subject, item.body))
+        sender = BulkSender(self.send_fn, self.account, max_workers=self.deliver_workers)
+        return results + sender.send(jobs, on_result=on_result)
+
+    def run(self, job_description: str, user_profile: str, recipients: Iterable[str],
+            fields: Optional[Dict[str, Dict[str, str]]] = None,
+            approve_fn: Optional[Callable[[PipelineItem], bool]] = None,
+            on_result: Optional[Callable[[SendResult], None]] = None) -> List[SendResult]:
+        """
+        Run all stages concurrently. ``approve_fn`` is called for every
+        rendered item and only approved items are delivered.
+        An error raised by ``recipients`` is re-raised once the items read
+        before it have been delivered.
+
+        Returns:
+            List[SendResult]: one result per delivered (or failed) item
+        """
+        outbox = self._start(job_description, user_profile, recipients, fields, approve_fn)
+        results = []
+        batch = []
+        for item in self._drain(outbox):
+            batch.append(item)
+            if len(batch) >= self.deliver_workers:
+                results.extend(self.deliver(batch, on_result))
+                batch = []
+        if batch:
+            results.extend(self.deliver(batch, on_result))
+        # Items read before the failure were still delivered (and reported via on_result)
+        self._raise_feed_error()
+        return results
@@ -0,0 +1,211 @@
+# prompt_compaction.py
+
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from llm_scheduler import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CACHE_SIZE = 32
+MAX_SKILLS = 40
+MAX_ROLES = 8
+MAX_HIGHLIGHTS = 12
+MAX_SECTION_LINES = 6
+MAX_JOB_DESCRIPTION_CHARS = 6000
+
+_URL_RE = re.compile(r"(?:https?://|www\.)\S+|\b(?:linkedin\.com|github\.com|gitlab\.com)/\S+", re.IGNORECASE)
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE_RE = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+_DATE_RANGE_RE = re.compile(
+    r"\b(?:19|20)\d{2}\s*(?:-|–|—|to)\s*(?:(?:\w{3,9}\.?\s+)?(?:19|20)\d{2}|present|current|now)\b",
+    re.IGNORECASE,
+)
+_NUMBER_RE = re.compile(r"\$?\d+(?:\.\d+)?\s*(?:%|x\b|[kmb]\b|\+|users|customers|engineers|ms\b)", re.IGNORECASE)
+_SKILLS_HEADING_RE = re.compile(r"^\s*(?:technical\s+|core\s+|key\s+)?skills\b[:\s]*", re.IGNORECASE)
+_HEADING_RE = re.compile(
+    r"^\s*(?:work\s+|professional\s+)?(?:experience|education|projects|certifications?|awards|summary|profile|"
+    r"employment|history|publications|languages|interests|achievements)\b\s*:?\s*$",
+    re.IGNORECASE,
+)
+# Headings whose lines are kept (trimmed) as their own section of the profile
+_SECTION_HEADINGS = (
+    ("summary", re.compile(r"summary|profile", re.IGNORECASE)),
+    ("education", re.compile(r"education", re.IGNORECASE)),
+    ("projects", re.compile(r"projects", re.IGNORECASE)),
+    ("certifications", re.compile(r"certifications?|awards|achievements|publications", re.IGNORECASE)),
+)
+_BULLET_RE = re.compile(r"^\s*[-•*▪◦●]\s*")
+
+# EEO statements and job-board chrome that never help write a cold email. Phrases
+# are matched in their boilerplate context (or as whole lines), so responsibilities
+# that merely mention e.g. privacy policies or background checks are kept.
+_BOILERPLATE_RE = re.compile(
+    r"\b(?:is|are|as) an? (?:proud )?(?:equal (?:employment )?opportunity|affirmative action)\b|"
+    r"\bequal employment opportunity\b|"
+    r"\bregardless of (?:their )?(?:race|colou?r|religion|age|sex|gender|national origin|disability)\b|"
+    r"\bapplicants will receive consideration\b|"
+    r"\breasonable accommodations? (?:to|for) (?:qualified )?(?:applicants|candidates|individuals)\b|"
+    r"\bparticipates? in e-verify\b|"
+    r"^(?:apply now|easy apply|apply|share this job|save this job|report this job|save|share)$|"
+    r"^(?:re)?posted \d+ (?:minute|hour|day|week|month)s? ago$|"
+    r"^\d+\+? applicants$",
+    re.IGNORECASE,
+)
+
+_profile_cache: "OrderedDict[str, str]" = OrderedDict()
+_profile_cache_lock = threading.Lock()
+
+
+def _lines(text: str) -> List[str]:
+    return [re.sub(r"\s+", " ", line).strip() for line in text.splitlines() if line.strip()]
+
+
+def extract_profile(resume_text: str) -> Dict[str, List[str]]:
+    """
+    Pull name, links, skills, roles and highlights out of resume text, and
+    keep the summary, education, projects and certifications sections
+    """
+    lines = _lines(resume_text)
+    profile = {"name": lines[:1], "links": [], "skills": [], "roles": [], "highlights": [],
+               "summary": [], "education": [], "projects": [], "certifications": []}
+
+    seen_links = set()
+    phones = [p for p in _PHONE_RE.findall(resume_text)
+              if len(re.sub(r"\D", "", p)) >= 10 and not _DATE_RANGE_RE.search(p)]
+    for match in _URL_RE.findall(resume_text) + _EMAIL_RE.findall(resume_text) + phones:
+        link = match.rstrip(".,;)|")
+        if link.lower() not in seen_links:
+            seen_links.add(link.lower())
+            profile["links"].append(link)
+
+    in_skills = False
+    section = None
+    seen_skills = set()
+    bullets = []
+    for index, line in enumerate(lines):
+        if _SKILLS_HEADING_RE.match(line):
+            in_skills = True
+            section = None
+            line = _SKILLS_HEADING_RE.sub("", line)
+        elif _HEADING_RE.match(line):
+            in_skills = False
+            heading = line.strip(" :")
+            section = next((name for name, pattern in _SECTION_HEADINGS if pattern.match(heading)), None)
+            continue
+
+        if in_skills:
+            for skill in re.split(r"[,;|•·]|\s{2,}", _BULLET_RE.sub("", line)):
+                skill = skill.split(":")[-1].strip()
+                if skill and len(skill) <= 40 and skill.lower() not in seen_skills:
+                    seen_skills.add(skill.lower())
+                    profile["skills"].append(skill)
+            continue
+
+        if section:
+            if profile[section] and _DATE_RANGE_RE.fullmatch(line.strip("() ")):
+                # Dates on their own line belong to the entry above
+                profile[section][-1] = f"{profile[section][-1]} ({line.strip('() ')})"
+            elif len(profile[section]) < MAX_SECTION_LINES:
+                profile[section].append(_BULLET_RE.sub("", line)[:200])
+            continue
+
+        if _DATE_RANGE_RE.search(line) and len(profile["roles"]) < MAX_ROLES:
+            role = line
+            # Titles are often on the line above the dates
+            previous = lines[index - 1] if index > 0 else ""
+            if (len(line) < 40 and previous and not _BULLET_RE.match(previous)
+                    and not _HEADING_RE.match(previous) and not _DATE_RANGE_RE.search(previous)):
+                role = f"{previous} {line}"
+            profile["roles"].append(role[:160])
+        elif _BULLET_RE.match(line):
+            bullets.append(_BULLET_RE.sub("", line)[:200])
+
+    # Quantified achievements first, then the rest in resume order
+    bullets.sort(key=lambda bullet: _NUMBER_RE.search(bullet) is None)
+    profile["highlights"] = bullets[:MAX_HIGHLIGHTS]
+    profile["skills"] = profile["skills"][:MAX_SKILLS]
+    return profile
+
+
+def render_profile(profile: Dict[str, List[str]]) -> str:
+    sections = []
+    if profile["name"]:
+        sections.append(f"Name: {profile['name'][0]}")
+    if profile["links"]:
+        sections.append("Links: " + ", ".join(profile["links"]))
+    if profile["summary"]:
+        sections.append("Summary: " + " ".join(profile["summary"]))
+    if profile["skills"]:
+        sections.append("Skills: " + ", ".join(profile["skills"]))
+    if profile["roles"]:
+        sections.append("Roles:\n" + "\n".join(f"- {role}" for role in profile["roles"]))
+    if profile["highlights"]:
+        sections.append("Highlights:\n" + "\n".join(f"- {item}" for item in profile["highlights"]))
+    for name in ("projects", "education", "certifications"):
+        if profile[name]:
+            sections.append(f"{name.capitalize()}:\n" + "\n".join(f"- {item}" for item in profile[name]))
+    return "\n".join(sections)
+
+
+def compact_profile(resume_text: str) -> str:
+    """
+    Compact structured profile for a resume, cached by content hash.
+
+    Falls back to the whitespace-normalized resume when too little
+    structure is found, or when the summary would not be smaller.
+    """
+    digest = hashlib.sha256(resume_text.encode("utf-8")).hexdigest()
+    with _profile_cache_lock:
+        cached = _profile_cache.get(digest)
+        if cached is not None:
+            _profile_cache.move_to_end(digest)
+            return cached
+
+    normalized = "\n".join(_lines(resume_text))
+    profile = extract_profile(resume_text)
+    compact = render_profile(profile)
+    if not (profile["skills"] or profile["roles"]) or len(compact) >= len(normalized):
+        compact = normalized
+
+    with _profile_cache_lock:
+        _profile_cache[digest] = compact
+        while len(_profile_cache) > PROFILE_CACHE_SIZE:
+            _profile_cache.popitem(last=False)
+    return compact
+
+
+def trim_job_description(job_description: str) -> str:
+    """Drop duplicate lines and job-board/legal boilerplate, capping the length"""
+    kept = []
+    seen = set()
+    for line in _lines(job_description):
+        key = line.lower()
+        if key in seen or _BOILERPLATE_RE.search(line):
+            continue
+        seen.add(key)
+        kept.append(line)
+    trimmed = "\n".join(kept)
+    if len(trimmed) > MAX_JOB_DESCRIPTION_CHARS:
+        trimmed = trimmed[:MAX_JOB_DESCRIPTION_CHARS].rsplit("\n", 1)[0]
+    return trimmed or job_description.strip()
+
+
+def compact_prompt_inputs(job_description: str, resume_text: str) -> Tuple[str, str, Dict[str, int]]:
+    """
+    Returns:
+        Tuple[str, str, Dict[str, int]]: (job description, profile, token
+        estimates before and after compaction)
+    """
+    job = trim_job_description(job_description)
+    profile = compact_profile(resume_text)
+    stats = {
+        "tokens_before": estimate_tokens(job_description) + estimate_tokens(resume_text),
+        "tokens_after": estimate_tokens(job) + estimate_tokens(profile),
+    }
+    logger.info(f"Prompt inputs compacted from ~{stats['tokens_before']} to ~{stats['tokens_after']} tokens")
+    return job, profile, stats
@@ -0,0 +1,153 @@
+# recipients.py
+
+import csv
+import io
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+# Pragmatic address syntax check; deliverability is checked separately
+EMAIL_RE = re.compile(r"^[A-Za-z0-9.!#$%&'*+/=?^_`{|}~-]+@[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+                      r"(?:\.[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?)+$")
+
+_FIELD_ALIASES = {
+    "email": "email", "e-mail": "email", "email address": "email", "recipient": "email",
+    "name": "recipient_name", "recipient_name": "recipient_name", "full name": "recipient_name",
+    "first name": "recipient_name", "first_name": "recipient_name", "contact": "recipient_name",
+    "company": "company", "organization": "company", "organisation": "company", "employer": "company",
+    "job_description": "job_description", "job description": "job_description", "job": "job_description",
+    "notes": "notes", "note": "notes", "context": "notes",
+}
+
+
+@dataclass
+class Recipient:
+    email: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    imported: int = 0
+    invalid: int = 0
+    duplicates: int = 0
+    invalid_samples: List[str] = field(default_factory=list)
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def validate_emails(emails: List[str]) -> List[bool]:
+    """Syntax-check a batch of addresses with one precompiled pattern"""
+    match = EMAIL_RE.match
+    return [len(email) <= 254 and match(email) is not None for email in emails]
+
+
+def _normalize_row(row: Dict[str, object]) -> Dict[str, str]:
+    normalized = {}
+    for key, value in row.items():
+        if key is None or value is None:
+            continue
+        name = _FIELD_ALIASES.get(str(key).strip().lower())
+        text = str(value).strip()
+        if name and text and name not in normalized:
+            normalized[name] = text
+    return normalized
+
+
+def _text_stream(source: Union[IO, str]) -> IO[str]:
+    if isinstance(source, str):
+        return open(source, newline="", encoding="utf-8-sig")
+    if isinstance(source, io.TextIOBase):
+        return source
+    return io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+
+
+def iter_rows(source: Union[IO, str], file_format: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """
+    Stream rows from a CSV or JSONL file (path or file object) with
+    normalized field names: email, recipient_name, company,
+    job_description and notes. A CSV without a header row is read as a
+    single email column.
+    """
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    file_format = (file_format or str(name).rsplit(".", 1)[-1]).lower()
+    stream = _text_stream(source)
+
+    if file_format in ("jsonl", "ndjson", "json"):
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping malformed JSONL line {line_number}")
+                continue
+            yield _normalize_row(record) if isinstance(record, dict) else {"email": str(record)}
+        return
+
+    first = stream.readline()
+    if not first:
+        return
+    header = next(csv.reader([first]))
+    if any(_FIELD_ALIASES.get(column.strip().lower()) == "email" for column in header):
+        for row in csv.DictReader(stream, fieldnames=header):
+            yield _normalize_row(row)
+    else:
+        for row in csv.reader(io.StringIO(first)):
+            yield {"email": row[0].strip()} if row else {}
+        for row in csv.reader(stream):
+            if row:
+                yield {"email": row[0].strip()}
+
+
+def iter_recipients(rows: Iterable[Dict[str, str]], seen: Optional[Set[str]] = None,
+                    stats: Optional[ImportStats] = None, batch_size: int = BATCH_SIZE) -> Iterator[List[Recipient]]:
+    """
+    Validate and de-duplicate streamed rows, yielding batches of recipients.
+
+    ``seen`` holds already-known addresses and is updated in place, so
+    dedup against an existing list is O(1) per row.
+    """
+    seen = set() if seen is None else seen
+    stats = stats or ImportStats()
+
+    def flush(batch):
+        emails = [normalize_email(row.get("email", "")) for row in batch]
+        accepted = []
+        for row, email, valid in zip(batch, emails, validate_emails(emails)):
+            if not valid:
+                stats.invalid += 1
+                if len(stats.invalid_samples) < 10:
+                    stats.invalid_samples.append(row.get("email", ""))
+            elif email in seen:
+                stats.duplicates += 1
+            else:
+                seen.add(email)
+                fields = {k: v for k, v in row.items() if k != "email"}
+                accepted.append(Recipient(email, fields))
+        stats.imported += len(accepted)
+        return accepted
+
+    batch = []
+    for row in rows:
+        stats.rows += 1
+        batch.append(row)
+        if len(batch) >= batch_size:
+            accepted = flush(batch)
+            batch = []
+            if accepted:
+                yield accepted
+    if batch:
+        accepted = flush(batch)
+        if accepted:
+            yield accepted
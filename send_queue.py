@@ -0,0 +1,477 @@
+# send_queue.py
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from bulk_sender import AccountRateLimiter, BulkSender, SendFunction, SendJob, SendResult
+from outcomes import AUTH, TRANSIENT, DeliveryOutcome, OutcomeStore, RetryScheduler, get_shared_outcome_store, message_key
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+GENERATED = "generated"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# Error recorded for messages that were mid-send when their worker stopped
+INTERRUPTED = "Interrupted before delivery was confirmed"
+
+RenderFunction = Callable[[str], Tuple[str, str]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id TEXT PRIMARY KEY,
+    sender TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    idempotency_key TEXT PRIMARY KEY,
+    campaign_id TEXT NOT NULL REFERENCES campaigns(id),
+    recipient TEXT NOT NULL,
+    state TEXT NOT NULL,
+    subject TEXT,
+    body TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL NOT NULL,
+    not_before REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS messages_campaign_state ON messages (campaign_id, state);
+"""
+
+
+def campaign_id_for(sender: str, job_description: str) -> str:
+    """Stable campaign id, so re-submitting the same job resumes the same campaign"""
+    return hashlib.sha256(f"{sender}\n{job_description}".encode("utf-8")).hexdigest()[:16]
+
+
+def idempotency_key(campaign_id: str, recipient: str) -> str:
+    return hashlib.sha256(f"{campaign_id}\n{recipient.lower()}".encode("utf-8")).hexdigest()
+
+
+class SendQueue:
+    """
+    Persistent (campaign, recipient) job queue in SQLite (WAL mode).
+
+    Every message moves pending -> generated -> sending -> sent | failed.
+    A message's idempotency key is derived from its campaign and
+    recipient, so a recipient is only ever queued once per campaign and
+    messages already claimed or marked sent are never handed out again.
+    A deferred message goes back to generated with a not-before time and
+    is only claimed again once that time has passed.
+    """
+
+    def __init__(self, db_path: str = "send_queue.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(messages)")]
+        if "not_before" not in columns:
+            # Queues created before deferred retries
+            self._db.execute("ALTER TABLE messages ADD COLUMN not_before REAL NOT NULL DEFAULT 0")
+        self._db.commit()
+
+    def create_campaign(self, campaign_id: str, sender: str):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR IGNORE INTO campaigns (id, sender, created) VALUES (?, ?, ?)",
+                (campaign_id, sender, time.time())
+            )
+
+    def enqueue(self, campaign_id: str, recipients: Iterable[str]) -> int:
+        """
+        Queue recipients for a campaign, ignoring ones already queued.
+
+        Returns:
+            int: number of newly queued recipients
+        """
+        now = time.time()
+        rows = [(idempotency_key(campaign_id, r), campaign_id, r, PENDING, now) for r in recipients]
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO messages (idempotency_key, campaign_id, recipient, state, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            return self._db.total_changes - before
+
+    def recipients_in_state(self, campaign_id: str, state: str) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT recipient FROM messages WHERE campaign_id = ? AND state = ? ORDER BY rowid",
+                (campaign_id, state)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def failures(self, campaign_id: str) -> Dict[str, str]:
+        """
+        Returns:
+            Dict[str, str]: recorded error for each failed recipient
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT recipient, COALESCE(error, '') FROM messages WHERE campaign_id = ? AND state = ? ORDER BY rowid",
+                (campaign_id, FAILED)
+            ).fetchall()
+        return dict(rows)
+
+    def mark_generated(self, campaign_id: str, recipient: str, subject: str, body: str):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE messages SET state = ?, subject = ?, body = ?, updated = ? "
+                "WHERE idempotency_key = ? AND state = ?",
+                (GENERATED, subject, body, time.time(), idempotency_key(campaign_id, recipient), PENDING)
+            )
+
+    def claim_generated(self, campaign_id: str, limit: int) -> List[SendJob]:
+        """Move the next batch of due generated messages to sending and return them for delivery"""
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT idempotency_key, recipient, subject, body FROM messages "
+                "WHERE campaign_id = ? AND state = ? AND not_before <= ? ORDER BY rowid LIMIT ?",
+                (campaign_id, GENERATED, time.time(), limit)
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE messages SET state = ?, updated = ? WHERE idempotency_key = ?",
+                [(SENDING, time.time(), row[0]) for row in rows]
+            )
+        return [SendJob(*row[1:]) for row in rows]
+
+    def recover_sending(self, campaign_id: str, outcomes: OutcomeStore) -> int:
+        """
+        Settle messages an interrupted worker left in sending, using the
+        outcome log rather than resending them: delivered messages become
+        sent, transient failures go back to generated, and everything else
+        (including messages with no recorded attempt, which may or may not
+        have been accepted) is marked failed for a manual retry.
+
+        Returns:
+            int: number of messages settled
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT recipient, subject, body FROM messages WHERE campaign_id = ? AND state = ?",
+                (campaign_id, SENDING)
+            ).fetchall()
+        if not rows:
+            return 0
+        latest = outcomes.latest(row[0] for row in rows)
+        updates = []
+        for recipient, subject, body in rows:
+            outcome = latest.get(recipient)
+            if outcome is None or outcome.message_key != message_key(subject, body):
+                state, error = FAILED, INTERRUPTED
+            elif outcome.success:
+                state, error = SENT, None
+            elif outcome.failure_class == TRANSIENT:
+                state, error = GENERATED, None
+            else:
+                state, error = FAILED, outcome.message
+            updates.append((state, error, time.time(), idempotency_key(campaign_id, recipient), SENDING))
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE messages SET state = ?, error = ?, updated = ? WHERE idempotency_key = ? AND state = ?",
+                updates
+            )
+        logger.warning(f"Recovered {len(updates)} interrupted send(s) for campaign {campaign_id}")
+        return len(updates)
+
+    def record_result(self, campaign_id: str, result: SendResult):
+        state = SENT if result.success else FAILED
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE messages SET state = ?, attempts = attempts + 1, error = ?, updated = ? "
+                "WHERE idempotency_key = ? AND state != ?",
+                (state, None if result.success else result.message, time.time(),
+                 idempotency_key(campaign_id, result.recipient), SENT)
+            )
+
+    def defer(self, campaign_id: str, recipient: str, error: str, delay: float):
+        """Put a claimed message back to generated after a transient failure, due again in ``delay`` seconds"""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE messages SET state = ?, attempts = attempts + 1, error = ?, updated = ?, not_before = ? "
+                "WHERE idempotency_key = ? AND state = ?",
+                (GENERATED, error, now, now + delay, idempotency_key(campaign_id, recipient), SENDING)
+            )
+
+    def attempts(self, campaign_id: str, recipient: str) -> int:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT attempts FROM messages WHERE idempotency_key = ?",
+                (idempotency_key(campaign_id, recipient),)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def next_due(self, campaign_id: str) -> Optional[float]:
+        """
+        Returns:
+            Optional[float]: seconds until the next deferred message is due
+            (0 if one already is), or None when nothing is waiting
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(not_before) FROM messages WHERE campaign_id = ? AND state = ?",
+                (campaign_id, GENERATED)
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def is_delivered(self, campaign_id: str, recipient: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM messages WHERE idempotency_key = ?",
+                (idempotency_key(campaign_id, recipient),)
+            ).fetchone()
+        return row is not None and row[0] == SENT
+
+    def retry_failed(self, campaign_id: str, recipients: Optional[Iterable[str]] = None) -> int:
+        """Requeue failed messages (optionally only ``recipients``) so the next drain retries them"""
+        query = ("UPDATE messages SET state = CASE WHEN subject IS NULL THEN ? ELSE ? END, updated = ?, "
+                 "not_before = 0 WHERE campaign_id = ? AND state = ?")
+        if recipients is None:
+            with self._lock, self._db:
+                return self._db.execute(query, (PENDING, GENERATED, time.time(), campaign_id, FAILED)).rowcount
+        rows = [(PENDING, GENERATED, time.time(), campaign_id, FAILED, idempotency_key(campaign_id, r))
+                for r in recipients]
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(query + " AND idempotency_key = ?", rows)
+            return self._db.total_changes - before
+
+    def progress(self, campaign_id: str) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: message count per state for the campaign
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT state, COUNT(*) FROM messages WHERE campaign_id = ? GROUP BY state",
+                (campaign_id,)
+            ).fetchall()
+        counts = {PENDING: 0, GENERATED: 0, SENDING: 0, SENT: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class QueueWorker(threading.Thread):
+    """
+    Background worker that drains one campaign: renders pending messages
+    with ``render_fn`` and delivers generated ones through ``send_fn``
+    (for example EmailSender.send_email). With ``retry`` (for example
+    EmailSender.retry_scheduler()) each batch goes through the retry
+    scheduler instead, and a transient failure is deferred in the queue
+    with the scheduler's backoff while later batches keep going.
+    Delivery can be paused, resumed and cancelled between batches, and
+    ``status()`` is safe to poll from other threads. Messages a previous
+    worker left in sending are settled against ``outcomes`` before any
+    new batch is claimed.
+    """
+
+    def __init__(self, queue: SendQueue, campaign_id: str, send_fn: SendFunction, account: str,
+                 render_fn: Optional[RenderFunction] = None, batch_size: int = 4,
+                 on_result: Optional[Callable[[SendResult], None]] = None, recent_results: int = 50,
+                 limiter: Optional[AccountRateLimiter] = None, retry: Optional[RetryScheduler] = None,
+                 outcomes: Optional[OutcomeStore] = None):
+        super().__init__(daemon=True, name=f"queue-worker-{campaign_id}")
+        self.queue = queue
+        self.campaign_id = campaign_id
+        self.account = account
+        self.render_fn = render_fn
+        self.batch_size = batch_size
+        self.on_result = on_result
+        self.sender = BulkSender(self._send_once, account, max_workers=batch_size, limiter=limiter)
+        self.retry = retry
+        self.outcomes = outcomes or get_shared_outcome_store()
+        self.recent: Deque[SendResult] = deque(maxlen=recent_results)
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._send_fn = send_fn
+        self._in_flight = 0
+        self._completed = 0
+        self._status_lock = threading.Lock()
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._cancelled = threading.Event()
+
+    def _send_once(self, recipient: str, subject: str, body: str) -> Tuple[bool, str]:
+        if self.queue.is_delivered(self.campaign_id, recipient):
+            return True, "Already delivered"
+        return self._send_fn(recipient, subject, body)
+
+    def _record_outcome(self, outcome: DeliveryOutcome):
+        if not outcome.success and outcome.failure_class == TRANSIENT:
+            attempts = self.queue.attempts(self.campaign_id, outcome.recipient) + 1
+            if attempts < self.retry.max_attempts:
+                delay = self.retry.backoff(attempts)
+                logger.info(f"Retrying {outcome.recipient} in {delay:.0f}s after: {outcome.message}")
+                self.queue.defer(self.campaign_id, outcome.recipient, outcome.message, delay)
+                with self._status_lock:
+                    self._in_flight -= 1
+                return
+        message = outcome.message if outcome.success else f"Failed to send email: {outcome.message}"
+        self._record(SendResult(outcome.recipient, outcome.success, message, send_seconds=outcome.seconds))
+
+    def _send_batch(self, jobs: List[SendJob]):
+        if self.retry is None:
+            self.sender.send(jobs, on_result=self._record)
+            return
+        pending = []
+        for job in jobs:
+            if self.queue.is_delivered(self.campaign_id, job.recipient):
+                self._record(SendResult(job.recipient, True, "Already delivered"))
+            else:
+                pending.append(job)
+        outcomes = self.retry.run(pending, on_outcome=self._record_outcome, defer_retries=True)
+        for outcome in outcomes:
+            if outcome.failure_class == AUTH:
+                # Every later send from the account would fail the same way
+                logger.error(f"Campaign {self.campaign_id} stopped: {outcome.message}")
+                self._cancelled.set()
+                break
+
+    def _record(self, result: SendResult):
+        self.queue.record_result(self.campaign_id, result)
+        with self._status_lock:
+            self._in_flight -= 1
+            self._completed += 1
+            self.recent.append(result)
+        if self.on_result:
+            self.on_result(result)
+
+    def render_pending(self):
+        if self.render_fn is None:
+            return
+        for recipient in self.queue.recipients_in_state(self.campaign_id, PENDING):
+            try:
+                subject, body = self.render_fn(recipient)
+            except Exception as e:
+                logger.error(f"Error rendering email for {recipient}: {str(e)}")
+                self.queue.record_result(self.campaign_id, SendResult(recipient, False, str(e)))
+                continue
+            self.queue.mark_generated(self.campaign_id, recipient, subject, body)
+
+    def pause(self):
+        """Stop starting new batches; the batch in flight still completes"""
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def cancel(self):
+        """Stop after the batch in flight; unsent messages stay queued for later"""
+        self._cancelled.set()
+        self._resumed.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._resumed.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def drain(self) -> Dict[str, int]:
+        """Process the campaign until nothing is left to send, returning its progress"""
+        self.started_at = time.monotonic()
+        try:
+            self.queue.recover_sending(self.campaign_id, self.outcomes)
+            self.render_pending()
+            while not self._cancelled.is_set():
+                self._resumed.wait()
+                if self._cancelled.is_set():
+                    break
+                jobs = self.queue.claim_generated(self.campaign_id, self.batch_size)
+                if not jobs:
+                    wait = self.queue.next_due(self.campaign_id)
+                    if wait is None:
+                        break
+                    # Deferred retries are not due yet; cancel() cuts the wait short
+                    self._cancelled.wait(min(wait, 1.0))
+                    continue
+                with self._status_lock:
+                    self._in_flight = len(jobs)
+                self._send_batch(jobs)
+        finally:
+            self.finished_at = time.monotonic()
+        return self.queue.progress(self.campaign_id)
+
+    def run(self):
+        try:
+            self.drain()
+        except Exception as e:
+            logger.error(f"Campaign {self.campaign_id} stopped: {str(e)}")
+
+    def status(self) -> Dict[str, object]:
+        """
+        Returns:
+            Dict[str, object]: per-state counts plus in_flight, state
+            (running/paused/cancelled/finished), rate per second and ETA seconds
+        """
+        progress = self.queue.progress(self.campaign_id)
+        with self._status_lock:
+            in_flight = self._in_flight
+            completed = self._completed
+        end = self.finished_at or time.monotonic()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        rate = completed / elapsed if elapsed > 0 else 0.0
+        # Pending messages (e.g. drafts awaiting review) are not part of this run
+        remaining = progress[GENERATED] + progress[SENDING]
+
+        if self.finished_at is not None:
+            state = "cancelled" if self.cancelled else "finished"
+        elif self.paused:
+            state = "paused"
+        else:
+            state = "running"
+
+        return dict(progress,
+                    in_flight=in_flight,
+                    state=state,
+                    rate_per_second=round(rate, 2),
+                    eta_seconds=round(remaining / rate, 1) if rate and state == "running" else None)
+
+
+class CampaignManager:
+    """
+    Process-wide owner of background campaign workers, so a campaign keeps
+    running when the Streamlit session that started it reruns or reloads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._workers: Dict[str, QueueWorker] = {}
+
+    def start(self, worker: QueueWorker) -> QueueWorker:
+        """Start ``worker`` unless one is already running for its campaign"""
+        with self._lock:
+            existing = self._workers.get(worker.campaign_id)
+            if existing is not None and existing.is_alive():
+                return existing
+            self._workers[worker.campaign_id] = worker
+            worker.start()
+            return worker
+
+    def get(self, campaign_id: str) -> Optional[QueueWorker]:
+        with self._lock:
+            return self._workers.get(campaign_id)
+
+    def active(self) -> List[QueueWorker]:
+        with self._lock:
+            return [worker for worker in self._workers.values() if worker.is_alive()]
@@ -0,0 +1,209 @@
+# sender_pool.py
+
+import datetime
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bulk_sender import get_account_limiter
+from email_sender import EmailSender
+from outcomes import AUTH, TRANSIENT, OutcomeStore, get_shared_outcome_store
+from smtp_pool import SMTPConnectionPool, get_shared_pool
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+REMAINING_QUOTA = "remaining_quota"
+POLICIES = (ROUND_ROBIN, LEAST_LOADED, REMAINING_QUOTA)
+
+# Replies that mean "this account, not this recipient, should back off".
+# 450/451 are per-recipient (mailbox busy, greylisting) and do not count.
+COOLDOWN_CODES = {421, 454, 535}
+
+
+class AccountState:
+    """Usage and cool-down counters for one sending account"""
+
+    def __init__(self, sent_today: int = 0):
+        self.day = datetime.date.today()
+        self.sent_today = sent_today
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.failures = 0
+
+
+_account_states: Dict[str, AccountState] = {}
+# Guards creation of account states and every update to their counters
+_account_lock = threading.Lock()
+
+
+def get_account_state(email: str, outcomes: Optional[OutcomeStore] = None) -> AccountState:
+    """
+    Return the process-wide state for a sender account, so every session
+    and every rebuilt SenderPool sees the same quota use and cool-downs.
+    On first use today's sends are counted from the outcome store.
+    """
+    with _account_lock:
+        state = _account_states.get(email)
+        if state is None:
+            midnight = time.mktime(datetime.date.today().timetuple())
+            sent = (outcomes or get_shared_outcome_store()).throughput(since=midnight, sender=email)["sent"]
+            state = AccountState(sent_today=sent)
+            _account_states[email] = state
+        return state
+
+
+class SenderAccount:
+    def __init__(self, email: str, password: str, daily_limit: int, pool: SMTPConnectionPool):
+        self.sender = EmailSender(pool=pool)
+        self.sender.credentials = {"email": email, "password": password}
+        self.daily_limit = daily_limit
+        self.state = get_account_state(email, self.sender.outcomes)
+
+    @property
+    def email(self) -> str:
+        return self.sender.credentials["email"]
+
+    @property
+    def remaining_quota(self) -> int:
+        state = self.state
+        today = datetime.date.today()
+        if today != state.day:
+            state.day = today
+            state.sent_today = 0
+        return self.daily_limit - state.sent_today
+
+    def available(self, now: float) -> bool:
+        return now >= self.state.cooldown_until and self.remaining_quota > 0
+
+
+class SenderPool:
+    """
+    Spreads sends across several verified accounts.
+
+    Each message goes to an account chosen by ``policy`` (round_robin,
+    least_loaded or remaining_quota). Accounts that answer with a
+    throttling or auth reply (421/454/535) or drop the connection
+    are put on cool-down and the message fails over to the next account.
+    Usage and cool-downs are tracked per account for the whole process
+    (see get_account_state), not per pool.
+    ``send_email`` has the same signature as EmailSender.send_email.
+    """
+
+    def __init__(self, policy: str = ROUND_ROBIN, cooldown: float = 300.0,
+                 per_minute: int = 60, max_wait: float = 120.0,
+                 pool: Optional[SMTPConnectionPool] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown sender policy {policy!r}; expected one of {POLICIES}")
+        self.policy = policy
+        self.cooldown = cooldown
+        self.per_minute = per_minute
+        self.max_wait = max_wait
+        self.pool = pool or get_shared_pool()
+        self.accounts: List[SenderAccount] = []
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    def add_account(self, email: str, password: str, daily_limit: int = 500) -> SenderAccount:
+        account = SenderAccount(email, password, daily_limit, self.pool)
+        with self._lock:
+            self.accounts = [a for a in self.accounts if a.email != email] + [account]
+        return account
+
+    def _choose(self, tried: set) -> Optional[SenderAccount]:
+        now = time.monotonic()
+        with self._lock:
+            accounts = list(self.accounts)
+        with _account_lock:
+            candidates = [a for a in accounts if a.email not in tried and a.available(now)]
+            if not candidates:
+                return None
+            if self.policy == LEAST_LOADED:
+                account = min(candidates, key=lambda a: (a.state.in_flight, a.state.sent_today))
+            elif self.policy == REMAINING_QUOTA:
+                account = max(candidates, key=lambda a: a.remaining_quota)
+            else:
+                account = candidates[next(self._counter) % len(candidates)]
+            account.state.in_flight += 1
+            return account
+
+    def _finish(self, account: SenderAccount, sent: bool, cool_down: bool = False):
+        with _account_lock:
+            state = account.state
+            state.in_flight -= 1
+            if sent:
+                state.sent_today += 1
+                state.failures = 0
+            if cool_down:
+                state.failures += 1
+                state.cooldown_until = time.monotonic() + self.cooldown * state.failures
+                logger.warning(f"Cooling down sender {account.email} for {self.cooldown * state.failures:.0f}s")
+
+    def send_email(self, recipient: str, subject: str, body: str) -> Tuple[bool, str]:
+        """
+        Send through the best available account, failing over on
+        account-level errors.
+
+        Returns:
+            Tuple[bool, str]: (success status, message)
+        """
+        tried = set()
+        throttled = set()
+        deadline = time.monotonic() + self.max_wait
+        last_error = "No sender account available"
+        while True:
+            account = self._choose(tried)
+            if account is None and throttled and time.monotonic() < deadline:
+                # Every usable account is only rate limited; wait for a token
+                time.sleep(1.0)
+                tried -= throttled
+                throttled.clear()
+                continue
+            if account is None:
+                logger.error(f"Failed to send email to {recipient}: {last_error}")
+                return False, f"Failed to send email: {last_error}"
+            tried.add(account.email)
+
+            limiter = get_account_limiter(account.email, per_minute=self.per_minute, per_day=account.daily_limit)
+            if not limiter.acquire(max_wait=0):
+                self._finish(account, sent=False)
+                throttled.add(account.email)
+                last_error = f"Rate limit reached for {account.email}"
+                continue
+
+            outcome = account.sender.attempt(recipient, subject, body)
+            if not outcome.success:
+                # Throttling/auth replies and dropped or refused connections are the account's problem
+                account_error = (outcome.code in COOLDOWN_CODES or outcome.failure_class == AUTH
+                                 or (outcome.code is None and outcome.failure_class == TRANSIENT))
+                self._finish(account, sent=False, cool_down=account_error)
+                if account_error:
+                    last_error = outcome.message
+                    continue
+                return False, f"Failed to send email: {outcome.message}"
+
+            self._finish(account, sent=True)
+            return True, f"Email sent successfully via {account.email}!"
+
+    def usage(self) -> List[Dict[str, object]]:
+        """
+        Returns:
+            List[Dict[str, object]]: per-account counters and cool-down state
+        """
+        now = time.monotonic()
+        with self._lock:
+            accounts = list(self.accounts)
+        with _account_lock:
+            return [
+                {
+                    "email": a.email,
+                    "sent_today": a.state.sent_today,
+                    "remaining_quota": a.remaining_quota,
+                    "in_flight": a.state.in_flight,
+                    "cooling_down_seconds": max(0.0, round(a.state.cooldown_until - now, 1)),
+                }
+                for a in accounts
+            ]
@@ -0,0 +1,232 @@
+# smtp_pool.py
+
+import hashlib
+import hmac
+import logging
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, int, str]
+
+# Errors after which smtplib has already issued RSET, so the session is still usable
+_RECOVERABLE_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+
+class SMTPDeliveryUnknown(smtplib.SMTPServerDisconnected):
+    """
+    The connection dropped after the message data was sent, so the server
+    may already have accepted it. Never resend on this error.
+    """
+
+
+def _credential(password: str) -> bytes:
+    return hashlib.sha256(password.encode("utf-8")).digest()
+
+
+class _PooledSession:
+    def __init__(self, server: smtplib.SMTP, credential: bytes):
+        self.server = server
+        # Digest of the password the session logged in with, checked on every checkout
+        self.credential = credential
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Pool of logged-in SMTP sessions keyed by (server, port, account).
+
+    Sessions are reused across messages, checked with NOOP before reuse and
+    transparently reopened when the server has dropped them. A session is
+    only handed out to a caller presenting the password it logged in with.
+    At most ``max_sessions`` sessions are checked out per key at any time.
+    """
+
+    def __init__(self, max_sessions: int = 4, idle_timeout: float = 240.0,
+                 timeout: float = 30.0, use_tls: bool = True,
+                 authenticate: bool = True, debuglevel: Optional[int] = None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.use_tls = use_tls
+        self.authenticate = authenticate
+        # SMTP wire debugging is opt-in: pass debuglevel or set SMTP_DEBUG=1
+        self.debuglevel = debuglevel if debuglevel is not None else int(os.environ.get("SMTP_DEBUG", "0"))
+        self._lock = threading.Lock()
+        self._idle: Dict[PoolKey, List[_PooledSession]] = {}
+        self._slots: Dict[PoolKey, threading.BoundedSemaphore] = {}
+
+    def _slot(self, key: PoolKey) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.max_sessions)
+                self._slots[key] = slot
+            return slot
+
+    def _open(self, key: PoolKey, password: str) -> _PooledSession:
+        host, port, email = key
+        logger.info(f"Opening SMTP session to {host}:{port} for {email}...")
+        with REGISTRY.timed("smtp_connect_seconds"):
+            server = smtplib.SMTP(host, port, timeout=self.timeout)
+        try:
+            if self.debuglevel:
+                server.set_debuglevel(self.debuglevel)
+            if self.use_tls:
+                with REGISTRY.timed("smtp_starttls_seconds"):
+                    server.starttls()
+            if self.authenticate:
+                with REGISTRY.timed("smtp_login_seconds"):
+                    server.login(email, password)
+        except Exception:
+            _close_quietly(server)
+            raise
+        return _PooledSession(server, _credential(password))
+
+    @staticmethod
+    def _is_alive(session: _PooledSession) -> bool:
+        try:
+            return session.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _checkout(self, key: PoolKey, password: str) -> _PooledSession:
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                session = idle.pop() if idle else None
+            if session is None:
+                return self._open(key, password)
+            if not hmac.compare_digest(session.credential, _credential(password)):
+                logger.info("Discarding SMTP session opened with different credentials")
+                _close_quietly(session.server)
+                continue
+            if time.monotonic() - session.last_used > self.idle_timeout:
+                _close_quietly(session.server)
+                continue
+            if self._is_alive(session):
+                return session
+            logger.info("Discarding SMTP session dropped by the server")
+            REGISTRY.inc("smtp_sessions_dropped_total")
+            _close_quietly(session.server)
+
+    def _release(self, key: PoolKey, session: _PooledSession):
+        session.last_used = time.monotonic()
+        with self._lock:
+            self._idle.setdefault(key, []).append(session)
+
+    @contextmanager
+    def session(self, host: str, port: int, email: str, password: str) -> Iterator[smtplib.SMTP]:
+        """
+        Check out a logged-in SMTP session, returning it to the pool afterwards.
+
+        Blocks while ``max_sessions`` sessions for the same key are in use.
+        """
+        key = (host, port, email)
+        slot = self._slot(key)
+        slot.acquire()
+        try:
+            session = self._checkout(key, password)
+            try:
+                yield session.server
+            except _RECOVERABLE_ERRORS:
+                self._release(key, session)
+                raise
+            except BaseException:
+                _close_quietly(session.server)
+                raise
+            else:
+                self._release(key, session)
+        finally:
+            slot.release()
+
+    def verify(self, host: str, port: int, email: str, password: str):
+        """
+        Log in over a fresh connection and keep it pooled for subsequent sends.
+
+        Raises the underlying smtplib error if the credentials are rejected.
+        """
+        key = (host, port, email)
+        session = self._open(key, password)
+        with self._lock:
+            stale = self._idle.pop(key, [])
+        for old in stale:
+            _close_quietly(old.server)
+        self._release(key, session)
+
+    def sendmail(self, host: str, port: int, email: str, password: str,
+                 recipients: Union[str, Sequence[str]], message: Union[str, bytes]) -> dict:
+        """
+        Send a message through a pooled session, reconnecting once if the
+        session was dropped before the message data went out (e.g. a stale
+        session failing at MAIL or RCPT). A drop after DATA raises
+        SMTPDeliveryUnknown instead of resending.
+
+        Returns:
+            dict: Refused recipients, as returned by smtplib.SMTP.sendmail
+        """
+        for attempt in (1, 2):
+            data_sent = []
+            try:
+                with self.session(host, port, email, password) as server:
+                    send_data = server.data
+
+                    def data(msg):
+                        data_sent.append(True)
+                        return send_data(msg)
+
+                    # smtplib.SMTP.sendmail looks data() up on the instance
+                    server.data = data
+                    try:
+                        with REGISTRY.timed("smtp_send_seconds"):
+                            return server.sendmail(email, recipients, message)
+                    finally:
+                        del server.data
+            except smtplib.SMTPServerDisconnected as e:
+                if data_sent:
+                    raise SMTPDeliveryUnknown(
+                        f"Connection dropped after the message was sent; it may have been delivered: {e}"
+                    ) from e
+                if attempt == 2:
+                    raise
+                logger.info("SMTP session dropped, reconnecting...")
+
+    def close_all(self):
+        """Quit every idle session held by the pool"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for sessions in idle.values():
+            for session in sessions:
+                _close_quietly(session.server)
+
+
+def _close_quietly(server: smtplib.SMTP):
+    try:
+        with REGISTRY.timed("smtp_quit_seconds"):
+            server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+_shared_pool: Optional[SMTPConnectionPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool() -> SMTPConnectionPool:
+    """Return the process-wide pool used by EmailSender and EmailGenerator"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SMTPConnectionPool()
+        return _shared_pool
@@ -1,5 +1,4 @@
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from message_builder import build_message
 import smtplib
 import logging
 
@@ -12,13 +11,8 @@ def test_gmail_connection(sender_email, app_password, recipient_email):
     """
     try:
         # Create message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
-        msg['Subject'] = "Test Email From Python"
-        
         body = "This is a test email to verify the SMTP connection works."
-        msg.attach(MIMEText(body, 'plain'))
+        msg = build_message(sender_email, recipient_email, "Test Email From Python", body)
 
         # Create SMTP session
         logger.info("Attempting to connect to SMTP server...")
@@ -32,8 +26,7 @@ def test_gmail_connection(sender_email, app_password, recipient_email):
         server.login(sender_email, app_password)
         
         logger.info("Sending email...")
-        text = msg.as_string()
-        server.sendmail(sender_email, recipient_email, text)
+        server.send_message(msg)
         
         logger.info("Closing server connection...")
         server.quit()
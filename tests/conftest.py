@@ -0,0 +1,96 @@
+# tests/conftest.py
+
+import os
+import sys
+import types
+
+import pytest
+
+# The application is a set of top-level modules in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VALID_REPLY = "SUBJECT: Senior Python Engineer at Acme\n\nDear {recipient_name},\n\nI build data pipelines.\n\nBest regards\n---END---"
+
+
+@pytest.fixture(autouse=True)
+def outcome_store(tmp_path, monkeypatch):
+    """Keep the process-wide outcome store out of the working directory"""
+    import outcomes
+
+    store = outcomes.OutcomeStore(str(tmp_path / "send_outcomes.db"))
+    monkeypatch.setattr(outcomes, "_shared_store", store)
+    yield store
+    store.close()
+
+
+class FakeChatClient:
+    """Groq-shaped client that returns canned replies in order and counts calls"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies) or [VALID_REPLY]
+        self.calls = 0
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        reply = self.replies[min(self.calls, len(self.replies) - 1)]
+        self.calls += 1
+        if kwargs.get("stream"):
+            return self._stream(reply)
+        message = types.SimpleNamespace(content=reply)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+    @staticmethod
+    def _stream(reply):
+        # Like the real API: a role-only delta and an empty chunk before any content
+        yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=None))])
+        yield types.SimpleNamespace(choices=[])
+        for start in range(0, len(reply), 8):
+            delta = types.SimpleNamespace(content=reply[start:start + 8])
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)])
+
+
+@pytest.fixture
+def make_generator(tmp_path):
+    from email_code import EmailGenerator
+    from llm_cache import LLMResponseCache
+    from llm_scheduler import GenerationScheduler
+
+    def make(client, **kwargs):
+        return EmailGenerator(
+            "test-key",
+            client=client,
+            cache=LLMResponseCache(),
+            scheduler=GenerationScheduler(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, base_delay=0.01),
+            **kwargs
+        )
+    return make
+
+
+@pytest.fixture
+def smtp_sink():
+    from benchmarks.servers import SMTPSink
+
+    servers = []
+
+    def start(**kwargs):
+        servers.append(SMTPSink(**kwargs).start())
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def chat_server():
+    from benchmarks.servers import FakeChatServer
+
+    servers = []
+
+    def start(**kwargs):
+        servers.append(FakeChatServer(**kwargs).start())
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
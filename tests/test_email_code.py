@@ -0,0 +1,123 @@
+# tests/test_email_code.py
+
+from conftest import VALID_REPLY, FakeChatClient
+from email_code import IncrementalEmailParser
+from metrics import REGISTRY
+
+JOB = "Senior Python engineer at Acme"
+PROFILE = "Jane Doe\nSkills: Python, SQL"
+
+
+def test_identical_draft_requests_are_served_from_cache(make_generator):
+    client = FakeChatClient(VALID_REPLY)
+    generator = make_generator(client)
+
+    first = generator.generate_draft(JOB, PROFILE)
+    second = generator.generate_draft(JOB, PROFILE)
+
+    assert first == second
+    assert first[0] is True
+    assert client.calls == 1
+
+
+def test_malformed_reply_is_not_cached(make_generator):
+    client = FakeChatClient("no subject line here", VALID_REPLY)
+    generator = make_generator(client)
+
+    assert generator.generate_draft(JOB, PROFILE) == (False, "Failed to parse email content")
+    success, draft = generator.generate_draft(JOB, PROFILE)
+
+    assert success is True
+    assert draft["subject"] == "Senior Python Engineer at Acme"
+    assert client.calls == 2
+
+
+def test_different_prompts_are_not_shared(make_generator):
+    client = FakeChatClient(VALID_REPLY)
+    generator = make_generator(client)
+
+    generator.generate_draft(JOB, PROFILE)
+    generator.generate_draft(JOB + " (remote)", PROFILE)
+
+    assert client.calls == 2
+
+
+def test_stream_draft_records_first_token_latency_once(make_generator):
+    generator = make_generator(FakeChatClient(VALID_REPLY))
+    REGISTRY.reset()
+
+    updates = list(generator.stream_draft(JOB, PROFILE))
+
+    assert updates[-1]["done"] and updates[-1]["subject"] == "Senior Python Engineer at Acme"
+    assert REGISTRY.snapshot()["histograms"]["llm_first_token_seconds"]["count"] == 1
+
+
+def test_stream_draft_holds_an_in_flight_slot_while_reading(make_generator):
+    generator = make_generator(FakeChatClient(VALID_REPLY))
+    slots = generator.scheduler._slots
+    updates = generator.stream_draft(JOB, PROFILE)
+
+    next(updates)
+    held = [slots.acquire(blocking=False) for _ in range(generator.scheduler.max_in_flight)]
+    for acquired in held:
+        if acquired:
+            slots.release()
+    assert not all(held)
+
+    list(updates)
+    assert slots.acquire(blocking=False)
+    slots.release()
+
+
+def test_personalization_fills_only_the_salutation(make_generator):
+    generator = make_generator(FakeChatClient(VALID_REPLY))
+    success, draft = generator.generate_draft(JOB, PROFILE)
+
+    email = generator.personalize_draft(draft, "bob@hays.com", {"recipient_name": "Bob"})
+
+    assert email["body"].startswith("Dear Bob,")
+    assert "Hays" not in email["body"]
+    assert generator.personalize_draft(draft, "x@gmail.com")["body"].startswith("Dear Hiring Manager,")
+
+
+def feed_all(parser, chunks):
+    return [parser.feed(chunk) for chunk in chunks]
+
+
+def test_parser_handles_markers_split_across_chunks():
+    parser = IncrementalEmailParser()
+    reply = "Sure!\nSUBJECT: Hello\n\nDear Bob,\nBody text\n---END---\ntrailing"
+
+    done = feed_all(parser, [reply[i:i + 3] for i in range(0, len(reply), 3)])
+
+    assert done[-1] is True
+    assert parser.result() == ("Hello", "Dear Bob,\nBody text")
+
+
+def test_parser_holds_back_a_partial_end_marker():
+    parser = IncrementalEmailParser()
+    parser.feed("SUBJECT: Hello\nBody text\n---E")
+
+    assert parser.subject == "Hello"
+    assert "Body text".startswith(parser.body)
+    assert not parser.done
+
+    assert parser.feed("ND---")
+    assert parser.body == "Body text"
+
+
+def test_parser_ignores_text_after_the_end_marker():
+    parser = IncrementalEmailParser()
+    feed_all(parser, ["SUBJECT: Hi\nBody\n---END---", "\nSUBJECT: Again\nMore\n---END---"])
+
+    assert parser.result() == ("Hi", "Body")
+
+
+def test_parser_rejects_malformed_replies():
+    no_subject = IncrementalEmailParser()
+    no_subject.feed("Dear Bob,\nBody\n---END---")
+    empty_body = IncrementalEmailParser()
+    empty_body.feed("SUBJECT: Hi\n\n---END---")
+
+    assert no_subject.result() is None
+    assert empty_body.result() is None
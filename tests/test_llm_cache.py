@@ -0,0 +1,72 @@
+# tests/test_llm_cache.py
+
+import time
+
+from llm_cache import LLMResponseCache, make_cache_key
+
+
+def test_keys_depend_on_every_request_parameter():
+    key = make_cache_key("model", "prompt", 0.7, 500)
+
+    assert key == make_cache_key("model", "prompt", 0.7, 500)
+    assert key != make_cache_key("other", "prompt", 0.7, 500)
+    assert key != make_cache_key("model", "prompt!", 0.7, 500)
+    assert key != make_cache_key("model", "prompt", 0.2, 500)
+    assert key != make_cache_key("model", "prompt", 0.7, 100)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = LLMResponseCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats() == {"hits": 3, "misses": 1, "entries": 2}
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    cache = LLMResponseCache(ttl=60)
+    cache.set("a", "1")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    LLMResponseCache(db_path=path).set("a", "1")
+
+    cache = LLMResponseCache(db_path=path)
+
+    assert cache.get("a") == "1"
+    assert cache.stats()["entries"] == 1
+
+
+def test_disk_tier_is_bounded_and_expires(tmp_path, monkeypatch):
+    path = str(tmp_path / "llm_cache.db")
+    writer = LLMResponseCache(db_path=path, max_disk_entries=2, ttl=60)
+    for index, key in enumerate("abc"):
+        monkeypatch.setattr(time, "time", lambda index=index: 1000.0 + index)
+        writer.set(key, key.upper())
+
+    reader = LLMResponseCache(db_path=path, ttl=60)
+    assert reader.get("a") is None
+    assert reader.get("c") == "C"
+
+    monkeypatch.setattr(time, "time", lambda: 2000.0)
+    assert LLMResponseCache(db_path=path, ttl=60).get("b") is None
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = LLMResponseCache(db_path=str(tmp_path / "llm_cache.db"))
+    cache.set("a", "1")
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert LLMResponseCache(db_path=str(tmp_path / "llm_cache.db")).get("a") is None
@@ -0,0 +1,107 @@
+# tests/test_llm_scheduler.py
+
+import json
+import time
+import types
+import urllib.error
+import urllib.request
+
+import pytest
+
+from llm_scheduler import GenerationScheduler, is_transient_error, retry_after_seconds
+
+
+class APIStatusError(Exception):
+    """Shaped like the SDK errors: a status code and the HTTP response"""
+
+    def __init__(self, status_code, headers):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = types.SimpleNamespace(headers=headers)
+
+
+def complete(base_url):
+    request = urllib.request.Request(
+        base_url + "/openai/v1/chat/completions",
+        data=json.dumps({"model": "test", "messages": [{"role": "user", "content": "hi"}]}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return json.load(response)["choices"][0]["message"]["content"]
+    except urllib.error.HTTPError as e:
+        raise APIStatusError(e.code, {key.lower(): value for key, value in e.headers.items()}) from None
+
+
+def make_scheduler(**kwargs):
+    options = dict(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, base_delay=60.0)
+    options.update(kwargs)
+    return GenerationScheduler(**options)
+
+
+def test_rate_limited_calls_are_retried_after_retry_after(chat_server):
+    server = chat_server(fail_first=2)
+    started = time.monotonic()
+
+    reply = make_scheduler().call(lambda: complete(server.base_url))
+
+    # base_delay is a minute, so finishing quickly means Retry-After: 0 was honoured
+    assert time.monotonic() - started < 5
+    assert reply.startswith("SUBJECT:")
+    assert server.requests == 3
+
+
+def test_retries_give_up_after_max_retries(chat_server):
+    server = chat_server(fail_first=10)
+
+    with pytest.raises(APIStatusError):
+        make_scheduler(max_retries=2).call(lambda: complete(server.base_url))
+    assert server.requests == 3
+
+
+def test_permanent_errors_are_not_retried():
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise APIStatusError(400, {})
+
+    with pytest.raises(APIStatusError):
+        make_scheduler().call(fail)
+    assert len(calls) == 1
+
+
+def test_error_classification():
+    assert is_transient_error(APIStatusError(429, {}))
+    assert is_transient_error(APIStatusError(503, {}))
+    assert not is_transient_error(APIStatusError(401, {}))
+    assert is_transient_error(ConnectionError())
+    assert retry_after_seconds(APIStatusError(429, {"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(APIStatusError(429, {"retry-after": "soon"})) is None
+    assert retry_after_seconds(ValueError()) is None
+
+
+def free_slots(scheduler):
+    acquired = 0
+    while scheduler._slots.acquire(blocking=False):
+        acquired += 1
+    for _ in range(acquired):
+        scheduler._slots.release()
+    return acquired
+
+
+def test_streams_hold_their_slot_until_read():
+    scheduler = make_scheduler(max_in_flight=2)
+
+    with scheduler.stream(lambda: iter(["a", "b"])) as stream:
+        assert free_slots(scheduler) == 1
+        assert list(stream) == ["a", "b"]
+
+    assert free_slots(scheduler) == 2
+
+
+def test_retry_after_is_capped_at_max_delay():
+    scheduler = make_scheduler(max_delay=5.0)
+
+    assert scheduler._backoff(0, APIStatusError(429, {"retry-after": "3600"})) == 5.0
+    assert scheduler._backoff(0, APIStatusError(429, {"retry-after": "2"})) == 2.0
@@ -0,0 +1,72 @@
+# tests/test_outcomes.py
+
+import smtplib
+import socket
+
+from bulk_sender import SendJob
+from outcomes import AUTH, PERMANENT, TRANSIENT, DeliveryOutcome, RetryScheduler, classify_failure
+from smtp_pool import SMTPDeliveryUnknown
+
+
+class ScriptedAttempts:
+    """attempt_fn that replays (success, code, failure class) per recipient"""
+
+    def __init__(self, script):
+        self.script = {recipient: list(steps) for recipient, steps in script.items()}
+        self.calls = []
+
+    def __call__(self, recipient, subject, body):
+        self.calls.append(recipient)
+        steps = self.script[recipient]
+        success, code, failure_class = steps.pop(0) if len(steps) > 1 else steps[0]
+        return DeliveryOutcome(recipient, "me@example.com", success, "ok" if success else f"{code} failed",
+                               code, failure_class)
+
+
+def jobs(*recipients):
+    return [SendJob(recipient, "Hello", "Body") for recipient in recipients]
+
+
+def test_transient_failures_are_retried():
+    attempts = ScriptedAttempts({"a@example.com": [(False, 421, TRANSIENT), (True, None, None)]})
+
+    [outcome] = RetryScheduler(attempts, base_delay=0.01).run(jobs("a@example.com"))
+
+    assert outcome.success
+    assert attempts.calls == ["a@example.com", "a@example.com"]
+
+
+def test_permanent_failures_are_final():
+    attempts = ScriptedAttempts({"a@example.com": [(False, 550, PERMANENT)]})
+
+    [outcome] = RetryScheduler(attempts, base_delay=0.01).run(jobs("a@example.com"))
+
+    assert not outcome.success
+    assert attempts.calls == ["a@example.com"]
+
+
+def test_retries_stop_at_max_attempts():
+    attempts = ScriptedAttempts({"a@example.com": [(False, 421, TRANSIENT)]})
+
+    [outcome] = RetryScheduler(attempts, max_attempts=3, base_delay=0.01).run(jobs("a@example.com"))
+
+    assert outcome.failure_class == TRANSIENT
+    assert len(attempts.calls) == 3
+
+
+def test_auth_failure_skips_the_remaining_jobs():
+    attempts = ScriptedAttempts({"a@example.com": [(False, 535, AUTH)], "b@example.com": [(True, None, None)]})
+
+    outcomes = RetryScheduler(attempts, max_workers=1).run(jobs("a@example.com", "b@example.com"))
+
+    assert [outcome.failure_class for outcome in outcomes] == [AUTH, AUTH]
+    assert attempts.calls == ["a@example.com"]
+
+
+def test_classify_failure():
+    assert classify_failure(smtplib.SMTPResponseException(421, b"busy")) == (421, TRANSIENT)
+    assert classify_failure(smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no")})) == (550, PERMANENT)
+    assert classify_failure(smtplib.SMTPAuthenticationError(535, b"bad")) == (535, AUTH)
+    assert classify_failure(smtplib.SMTPServerDisconnected()) == (None, TRANSIENT)
+    assert classify_failure(socket.timeout()) == (None, TRANSIENT)
+    assert classify_failure(SMTPDeliveryUnknown()) == (None, PERMANENT)
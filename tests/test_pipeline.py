@@ -0,0 +1,78 @@
+# tests/test_pipeline.py
+
+import threading
+
+import pytest
+
+from conftest import VALID_REPLY, FakeChatClient
+from pipeline import EmailPipeline
+
+JOB = "Senior Python engineer at Acme"
+PROFILE = "Jane Doe\nSkills: Python, SQL"
+
+
+class RecordingSender:
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def __call__(self, recipient, subject, body):
+        with self._lock:
+            self.sent.append((recipient, body))
+        return True, "Email sent successfully!"
+
+
+def failing_after(recipients, error):
+    yield from recipients
+    raise error
+
+
+@pytest.fixture
+def pipeline(make_generator):
+    client = FakeChatClient(VALID_REPLY)
+    pipeline = EmailPipeline(make_generator(client), RecordingSender(), "pipeline@example.com",
+                             queue_size=2, generate_workers=2, deliver_workers=2)
+    pipeline.client = client
+    return pipeline
+
+
+def test_one_draft_is_personalized_per_recipient(pipeline):
+    results = pipeline.run(JOB, PROFILE, ["a@example.com", "b@example.com", "c@example.com"],
+                           fields={"b@example.com": {"recipient_name": "Bob"}})
+
+    assert all(result.success for result in results)
+    assert pipeline.client.calls == 1
+    bodies = dict(pipeline.send_fn.sent)
+    assert bodies["b@example.com"].startswith("Dear Bob,")
+    assert bodies["a@example.com"].startswith("Dear Hiring Manager,")
+
+
+def test_prepare_does_not_send(pipeline):
+    items = pipeline.prepare(JOB, PROFILE, ["a@example.com"])
+
+    assert [item.recipient for item in items] == ["a@example.com"]
+    assert items[0].subject and items[0].error is None
+    assert pipeline.send_fn.sent == []
+
+
+def test_unapproved_items_are_not_delivered(pipeline):
+    results = pipeline.run(JOB, PROFILE, ["a@example.com", "b@example.com"],
+                           approve_fn=lambda item: item.recipient != "b@example.com")
+
+    assert [result.recipient for result in results] == ["a@example.com"]
+
+
+def test_error_from_the_recipients_iterable_is_raised_after_delivery(pipeline):
+    recipients = failing_after(["a@example.com", "b@example.com"], OSError("list went away"))
+
+    with pytest.raises(OSError, match="list went away"):
+        pipeline.run(JOB, PROFILE, recipients)
+    assert sorted(recipient for recipient, _ in pipeline.send_fn.sent) == ["a@example.com", "b@example.com"]
+
+
+def test_error_from_the_recipients_iterable_is_raised_by_prepare(pipeline):
+    with pytest.raises(ValueError):
+        pipeline.prepare(JOB, PROFILE, failing_after(["a@example.com"], ValueError("bad row")))
+
+    # The pipeline is reusable after a failed run
+    assert len(pipeline.prepare(JOB, PROFILE, ["a@example.com"])) == 1
@@ -0,0 +1,55 @@
+# tests/test_recipients.py
+
+import io
+
+from recipients import ImportStats, iter_recipients, iter_rows, validate_emails
+
+
+def test_csv_headers_are_normalized(tmp_path):
+    path = tmp_path / "list.csv"
+    path.write_text("E-mail,Full Name,Organization,Ignored\nJane@Example.com,Jane,Acme,x\n", encoding="utf-8")
+
+    assert list(iter_rows(str(path))) == [
+        {"email": "Jane@Example.com", "recipient_name": "Jane", "company": "Acme"}
+    ]
+
+
+def test_csv_without_header_is_a_single_email_column():
+    rows = iter_rows(io.StringIO("a@example.com\nb@example.com,extra\n\n"), file_format="csv")
+
+    assert list(rows) == [{"email": "a@example.com"}, {"email": "b@example.com"}]
+
+
+def test_jsonl_skips_malformed_lines():
+    source = io.BytesIO(b'{"email": "a@example.com", "name": "Ann"}\nnot json\n"b@example.com"\n')
+
+    assert list(iter_rows(source, file_format="jsonl")) == [
+        {"email": "a@example.com", "recipient_name": "Ann"},
+        {"email": "b@example.com"},
+    ]
+
+
+def test_recipients_are_validated_deduplicated_and_batched():
+    rows = [{"email": f"user{i}@example.com"} for i in range(5)]
+    rows += [{"email": "USER0@example.com"}, {"email": "not-an-address"}, {"email": "known@example.com"}]
+    stats = ImportStats()
+
+    batches = list(iter_recipients(iter(rows), seen={"known@example.com"}, stats=stats, batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0].email == "user0@example.com"
+    assert (stats.rows, stats.imported, stats.invalid, stats.duplicates) == (8, 5, 1, 2)
+    assert stats.invalid_samples == ["not-an-address"]
+
+
+def test_fields_travel_with_the_recipient():
+    [[recipient]] = iter_recipients([{"email": " Bob@Example.com ", "recipient_name": "Bob"}])
+
+    assert recipient.email == "bob@example.com"
+    assert recipient.fields == {"recipient_name": "Bob"}
+
+
+def test_validate_emails():
+    assert validate_emails(["a@example.com", "a@b", "a b@example.com", "x" * 250 + "@example.com"]) == [
+        True, False, False, False
+    ]
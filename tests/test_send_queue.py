@@ -0,0 +1,188 @@
+# tests/test_send_queue.py
+
+import sqlite3
+import time
+
+import pytest
+
+from bulk_sender import SendResult
+from outcomes import PERMANENT, TRANSIENT, DeliveryOutcome, OutcomeStore, RetryScheduler, message_key
+from send_queue import FAILED, GENERATED, INTERRUPTED, PENDING, SENDING, SENT, QueueWorker, SendQueue
+
+CAMPAIGN = "campaign"
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = SendQueue(str(tmp_path / "send_queue.db"))
+    queue.create_campaign(CAMPAIGN, "me@example.com")
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def outcomes(tmp_path):
+    store = OutcomeStore(str(tmp_path / "send_outcomes.db"))
+    yield store
+    store.close()
+
+
+def generate(queue, recipients, subject="Hello", body="Body"):
+    queue.enqueue(CAMPAIGN, recipients)
+    for recipient in recipients:
+        queue.mark_generated(CAMPAIGN, recipient, subject, body)
+
+
+class CountingSender:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+
+    def __call__(self, recipient, subject, body):
+        self.sent.append(recipient)
+        if recipient in self.failing:
+            return False, "Failed to send email: 550 no such user"
+        return True, "Email sent successfully!"
+
+
+def drain(queue, outcomes, send_fn):
+    return QueueWorker(queue, CAMPAIGN, send_fn, "me@example.com", outcomes=outcomes).drain()
+
+
+def test_recipients_are_queued_once_per_campaign(queue):
+    assert queue.enqueue(CAMPAIGN, ["a@example.com", "b@example.com"]) == 2
+    assert queue.enqueue(CAMPAIGN, ["A@example.com", "b@example.com", "c@example.com"]) == 1
+    assert queue.progress(CAMPAIGN)[PENDING] == 3
+
+
+def test_draining_again_does_not_resend(queue, outcomes):
+    generate(queue, ["a@example.com", "b@example.com"])
+    sender = CountingSender()
+
+    assert drain(queue, outcomes, sender)[SENT] == 2
+    generate(queue, ["a@example.com", "b@example.com", "c@example.com"])
+    assert drain(queue, outcomes, sender)[SENT] == 3
+
+    assert sender.sent == ["a@example.com", "b@example.com", "c@example.com"]
+
+
+def test_retry_failed_resends_only_failures(queue, outcomes):
+    generate(queue, ["a@example.com", "b@example.com"])
+    sender = CountingSender(failing={"b@example.com"})
+    assert drain(queue, outcomes, sender)[FAILED] == 1
+
+    assert queue.retry_failed(CAMPAIGN) == 1
+    sender.failing.clear()
+    progress = drain(queue, outcomes, sender)
+
+    assert progress[SENT] == 2
+    assert sender.sent == ["a@example.com", "b@example.com", "b@example.com"]
+
+
+def test_claimed_messages_are_not_handed_out_twice(queue):
+    generate(queue, ["a@example.com", "b@example.com"])
+
+    first = queue.claim_generated(CAMPAIGN, 10)
+
+    assert [job.recipient for job in first] == ["a@example.com", "b@example.com"]
+    assert queue.claim_generated(CAMPAIGN, 10) == []
+    assert queue.progress(CAMPAIGN)[SENDING] == 2
+
+    queue.record_result(CAMPAIGN, SendResult("a@example.com", True, "ok"))
+    assert queue.progress(CAMPAIGN)[SENT] == 1
+
+
+def test_interrupted_sends_are_settled_from_the_outcome_log(queue, outcomes):
+    recipients = ["sent@example.com", "busy@example.com", "gone@example.com", "unknown@example.com"]
+    generate(queue, recipients)
+    queue.claim_generated(CAMPAIGN, 10)
+    key = message_key("Hello", "Body")
+    outcomes.record(DeliveryOutcome("sent@example.com", "me@example.com", True, "ok", message_key=key))
+    outcomes.record(DeliveryOutcome("busy@example.com", "me@example.com", False, "421 busy", 421, TRANSIENT,
+                                    message_key=key))
+    outcomes.record(DeliveryOutcome("gone@example.com", "me@example.com", False, "550 no such user", 550, PERMANENT,
+                                    message_key=key))
+    # A success for a different message says nothing about this one
+    outcomes.record(DeliveryOutcome("unknown@example.com", "me@example.com", True, "ok",
+                                    message_key=message_key("Other", "Body")))
+
+    assert queue.recover_sending(CAMPAIGN, outcomes) == 4
+
+    assert queue.recipients_in_state(CAMPAIGN, SENT) == ["sent@example.com"]
+    assert queue.recipients_in_state(CAMPAIGN, GENERATED) == ["busy@example.com"]
+    assert queue.failures(CAMPAIGN) == {"gone@example.com": "550 no such user", "unknown@example.com": INTERRUPTED}
+    assert queue.progress(CAMPAIGN)[SENDING] == 0
+
+
+class FlakyAttempts:
+    """attempt_fn whose listed recipients fail transiently ``failures`` times"""
+
+    def __init__(self, flaky, failures=1):
+        self.remaining = {recipient: failures for recipient in flaky}
+        self.calls = []
+
+    def __call__(self, recipient, subject, body):
+        self.calls.append(recipient)
+        if self.remaining.get(recipient, 0) > 0:
+            self.remaining[recipient] -= 1
+            return DeliveryOutcome(recipient, "me@example.com", False, "451 greylisted", 451, TRANSIENT)
+        return DeliveryOutcome(recipient, "me@example.com", True, "Email sent successfully!")
+
+
+def retrying_worker(queue, outcomes, attempts, **kwargs):
+    return QueueWorker(queue, CAMPAIGN, None, "me@example.com", batch_size=1, outcomes=outcomes,
+                       retry=RetryScheduler(attempts, max_workers=1, **kwargs))
+
+
+def test_transient_failure_does_not_hold_up_later_batches(queue, outcomes):
+    generate(queue, ["busy@example.com", "a@example.com", "b@example.com"])
+    attempts = FlakyAttempts({"busy@example.com"})
+
+    progress = retrying_worker(queue, outcomes, attempts, base_delay=0.2).drain()
+
+    assert progress[SENT] == 3
+    assert attempts.calls == ["busy@example.com", "a@example.com", "b@example.com", "busy@example.com"]
+
+
+def test_retries_stop_at_max_attempts(queue, outcomes):
+    generate(queue, ["busy@example.com"])
+    attempts = FlakyAttempts({"busy@example.com"}, failures=10)
+
+    progress = retrying_worker(queue, outcomes, attempts, base_delay=0.01, max_attempts=3).drain()
+
+    assert progress[FAILED] == 1
+    assert len(attempts.calls) == 3
+
+
+def test_cancel_does_not_wait_for_deferred_retries(queue, outcomes):
+    generate(queue, ["busy@example.com", "a@example.com"])
+    attempts = FlakyAttempts({"busy@example.com"})
+    worker = retrying_worker(queue, outcomes, attempts, base_delay=60.0)
+    worker.start()
+    deadline = time.monotonic() + 5
+    while queue.progress(CAMPAIGN)[SENT] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    worker.cancel()
+    worker.join(timeout=3)
+
+    assert not worker.is_alive()
+    assert worker.status()["state"] == "cancelled"
+    assert queue.recipients_in_state(CAMPAIGN, GENERATED) == ["busy@example.com"]
+
+
+def test_queues_from_before_deferred_retries_are_upgraded(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE messages (idempotency_key TEXT PRIMARY KEY, campaign_id TEXT NOT NULL, "
+               "recipient TEXT NOT NULL, state TEXT NOT NULL, subject TEXT, body TEXT, "
+               "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, updated REAL NOT NULL)")
+    db.commit()
+    db.close()
+
+    queue = SendQueue(path)
+    queue.create_campaign(CAMPAIGN, "me@example.com")
+    generate(queue, ["a@example.com"])
+
+    assert [job.recipient for job in queue.claim_generated(CAMPAIGN, 10)] == ["a@example.com"]
+    queue.close()
@@ -0,0 +1,84 @@
+# tests/test_sender_pool.py
+
+import time
+
+import pytest
+
+import sender_pool as sender_pool_module
+from outcomes import TRANSIENT, DeliveryOutcome
+from sender_pool import LEAST_LOADED, SenderPool
+from smtp_pool import SMTPConnectionPool
+
+
+@pytest.fixture(autouse=True)
+def account_states(monkeypatch):
+    monkeypatch.setattr(sender_pool_module, "_account_states", {})
+
+
+@pytest.fixture
+def sender_pool():
+    pool = SenderPool(pool=SMTPConnectionPool(use_tls=False, authenticate=False))
+    for email in ("first@example.com", "second@example.com"):
+        pool.add_account(email, "secret")
+    return pool
+
+
+def reply_with(account, code):
+    calls = []
+
+    def attempt(recipient, subject, body):
+        calls.append(recipient)
+        if code is None:
+            return DeliveryOutcome(recipient, account.email, True, "ok")
+        return DeliveryOutcome(recipient, account.email, False, f"{code} try later", code, TRANSIENT)
+    account.sender.attempt = attempt
+    return calls
+
+
+@pytest.mark.parametrize("code", [421, 454])
+def test_account_throttling_fails_over(sender_pool, code):
+    first, second = sender_pool.accounts
+    reply_with(first, code)
+    reply_with(second, None)
+
+    success, message = sender_pool.send_email("you@example.com", "Hello", "Body")
+
+    assert success and "second@example.com" in message
+    assert [usage["cooling_down_seconds"] > 0 for usage in sender_pool.usage()] == [True, False]
+
+
+@pytest.mark.parametrize("code", [450, 451])
+def test_recipient_deferrals_do_not_cool_the_account_down(sender_pool, code):
+    first, second = sender_pool.accounts
+    reply_with(first, code)
+    second_calls = reply_with(second, None)
+
+    success, _ = sender_pool.send_email("you@example.com", "Hello", "Body")
+
+    assert not success
+    assert second_calls == []
+    assert all(usage["cooling_down_seconds"] == 0 for usage in sender_pool.usage())
+
+
+def test_pools_share_account_usage_and_cool_downs(sender_pool, outcome_store):
+    first, second = sender_pool.accounts
+    reply_with(first, 421)
+    reply_with(second, None)
+    sender_pool.send_email("you@example.com", "Hello", "Body")
+
+    rebuilt = SenderPool(policy=LEAST_LOADED, pool=SMTPConnectionPool(use_tls=False, authenticate=False))
+    for email in ("first@example.com", "second@example.com"):
+        rebuilt.add_account(email, "secret")
+
+    assert rebuilt.usage() == sender_pool.usage()
+    assert [usage["sent_today"] for usage in rebuilt.usage()] == [0, 1]
+    assert rebuilt.usage()[0]["cooling_down_seconds"] > 0
+
+
+def test_sent_today_is_seeded_from_the_outcome_store(outcome_store):
+    outcome_store.record(DeliveryOutcome("you@example.com", "first@example.com", True, "ok", started=time.time()))
+
+    pool = SenderPool(pool=SMTPConnectionPool(use_tls=False, authenticate=False))
+    pool.add_account("first@example.com", "secret")
+
+    assert pool.usage()[0]["sent_today"] == 1
@@ -0,0 +1,78 @@
+# tests/test_smtp_pool.py
+
+import pytest
+
+from smtp_pool import SMTPConnectionPool, SMTPDeliveryUnknown
+
+SENDER = "me@example.com"
+MESSAGE = b"Subject: Hello\r\n\r\nHello from the tests\r\n"
+
+
+@pytest.fixture
+def pool():
+    pool = SMTPConnectionPool(max_sessions=2, use_tls=False, authenticate=False)
+    yield pool
+    pool.close_all()
+
+
+def send(pool, sink, recipients="you@example.com"):
+    return pool.sendmail("127.0.0.1", sink.port, SENDER, "", recipients, MESSAGE)
+
+
+def test_sessions_are_reused_across_messages(pool, smtp_sink):
+    sink = smtp_sink()
+
+    for _ in range(5):
+        assert send(pool, sink) == {}
+
+    assert sink.messages == 5
+    assert sink.connections == 1
+
+
+def test_sessions_are_not_reused_with_a_different_password(pool, smtp_sink):
+    sink = smtp_sink()
+
+    pool.sendmail("127.0.0.1", sink.port, SENDER, "right", "you@example.com", MESSAGE)
+    pool.sendmail("127.0.0.1", sink.port, SENDER, "wrong", "you@example.com", MESSAGE)
+    pool.sendmail("127.0.0.1", sink.port, SENDER, "wrong", "you@example.com", MESSAGE)
+
+    assert sink.connections == 2
+
+
+def test_session_closed_by_the_server_is_reopened(pool, smtp_sink):
+    sink = smtp_sink(messages_per_connection=1)
+
+    for _ in range(3):
+        send(pool, sink)
+
+    assert sink.messages == 3
+    assert sink.connections == 3
+
+
+def test_session_dropped_before_data_is_retried_once(pool, smtp_sink, monkeypatch):
+    sink = smtp_sink(messages_per_connection=1)
+    send(pool, sink)
+    # Let the stale session past the NOOP check so it fails at MAIL FROM
+    monkeypatch.setattr(pool, "_is_alive", lambda session: True)
+
+    send(pool, sink)
+
+    assert sink.messages == 2
+    assert sink.connections == 2
+
+
+def test_drop_after_data_is_not_resent(pool, smtp_sink):
+    sink = smtp_sink(drop_after_data=True)
+
+    with pytest.raises(SMTPDeliveryUnknown):
+        send(pool, sink)
+    assert sink.messages == 1
+
+
+def test_refused_recipients_are_reported(pool, smtp_sink):
+    sink = smtp_sink()
+
+    refused = send(pool, sink, ["you@example.com", "reject@example.com"])
+
+    assert list(refused) == ["reject@example.com"]
+    assert sink.messages == 1
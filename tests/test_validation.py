@@ -0,0 +1,134 @@
+# tests/test_validation.py
+
+import socket
+import sys
+import types
+
+import pytest
+
+from validation import INVALID_SYNTAX, NO_MX, REJECTED, UNKNOWN, VALID, MXCache, RecipientValidator, dns_resolve_mx
+
+
+class StubResolver:
+    def __init__(self, answers):
+        self.answers = answers
+        self.lookups = []
+
+    def __call__(self, domain):
+        self.lookups.append(domain)
+        answer = self.answers[domain]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def reasons(results):
+    return {result.email: result.reason for result in results}
+
+
+def test_only_authoritative_answers_reject():
+    resolver = StubResolver({"good.com": ["mx.good.com"], "gone.com": [], "slow.com": None,
+                             "broken.com": OSError("resolver down")})
+    validator = RecipientValidator(resolver=resolver)
+
+    results = validator.validate(["a@good.com", "b@gone.com", "c@slow.com", "d@broken.com", "not-an-address"])
+
+    assert reasons(results) == {"a@good.com": VALID, "b@gone.com": NO_MX, "c@slow.com": UNKNOWN,
+                                "d@broken.com": UNKNOWN, "not-an-address": INVALID_SYNTAX}
+    assert [result.deliverable for result in results] == [True, False, True, True, False]
+    assert results[0].mx == "mx.good.com"
+
+
+def test_each_domain_is_resolved_once_and_cached():
+    resolver = StubResolver({"good.com": ["mx.good.com"], "slow.com": None})
+    validator = RecipientValidator(resolver=resolver, cache=MXCache())
+
+    validator.filter(["a@good.com", "b@good.com", "c@slow.com"])
+    validator.filter(["d@good.com", "e@slow.com"])
+
+    # Unknown answers are not cached, so they are asked again next time
+    assert sorted(resolver.lookups) == ["good.com", "slow.com", "slow.com"]
+
+
+def test_rcpt_probe_rejects_refused_mailboxes(smtp_sink):
+    sink = smtp_sink()
+    validator = RecipientValidator(resolver=StubResolver({"example.com": ["127.0.0.1"]}), probe=True,
+                                   probe_sender="me@example.com", probe_port=sink.port)
+
+    deliverable, rejected = validator.filter(["ok@example.com", "reject@example.com"])
+
+    assert deliverable == ["ok@example.com"]
+    assert [(result.email, result.reason) for result in rejected] == [("reject@example.com", REJECTED)]
+    assert sink.messages == 0
+
+
+def test_unreachable_probe_target_does_not_reject():
+    validator = RecipientValidator(resolver=StubResolver({"example.com": ["127.0.0.1"]}), probe=True,
+                                   probe_port=1)
+
+    assert validator.filter(["ok@example.com"]) == (["ok@example.com"], [])
+
+
+def test_address_fallback_never_rejects(monkeypatch):
+    monkeypatch.setitem(sys.modules, "dns", None)
+
+    def no_address(*args, **kwargs):
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+    monkeypatch.setattr(socket, "getaddrinfo", no_address)
+    assert dns_resolve_mx("gmail.com") is None
+
+    monkeypatch.setattr(socket, "getaddrinfo", lambda *args, **kwargs: [])
+    assert dns_resolve_mx("gmail.com") == ["gmail.com"]
+
+
+@pytest.fixture
+def fake_dns(monkeypatch):
+    """Minimal stand-in for the dnspython modules dns_resolve_mx uses"""
+    exception = types.ModuleType("dns.exception")
+    resolver = types.ModuleType("dns.resolver")
+    exception.DNSException = type("DNSException", (Exception,), {})
+    for name in ("NXDOMAIN", "NoAnswer", "NoNameservers"):
+        setattr(resolver, name, type(name, (exception.DNSException,), {}))
+    package = types.ModuleType("dns")
+    package.exception, package.resolver = exception, resolver
+    for name, module in (("dns", package), ("dns.exception", exception), ("dns.resolver", resolver)):
+        monkeypatch.setitem(sys.modules, name, module)
+
+    def answer(result):
+        def resolve(domain, rdtype, lifetime=None):
+            if isinstance(result, type):
+                raise result()
+            return [types.SimpleNamespace(preference=preference, exchange=host) for preference, host in result]
+        resolver.resolve = resolve
+    return resolver, answer
+
+
+def test_mx_records_in_preference_order(fake_dns):
+    _, answer = fake_dns
+    answer([(20, "backup.example.com."), (10, "mx.example.com.")])
+
+    assert dns_resolve_mx("example.com") == ["mx.example.com", "backup.example.com"]
+
+
+def test_nxdomain_and_null_mx_reject(fake_dns):
+    resolver, answer = fake_dns
+    answer(resolver.NXDOMAIN)
+    assert dns_resolve_mx("example.com") == []
+
+    answer([(0, ".")])
+    assert dns_resolve_mx("example.com") == []
+
+
+def test_servfail_is_unknown(fake_dns):
+    resolver, answer = fake_dns
+    answer(resolver.NoNameservers)
+
+    assert dns_resolve_mx("example.com") is None
+
+
+def test_no_mx_falls_back_to_the_address_record(fake_dns, monkeypatch):
+    resolver, answer = fake_dns
+    answer(resolver.NoAnswer)
+    monkeypatch.setattr(socket, "getaddrinfo", lambda *args, **kwargs: [])
+
+    assert dns_resolve_mx("example.com") == ["example.com"]
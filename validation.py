@@ -0,0 +1,238 @@
+# validation.py
+
+import logging
+import smtplib
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from metrics import REGISTRY
+from recipients import normalize_email, validate_emails
+from smtp_pool import SMTPConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# A resolver returns MX hosts in preference order, [] only when DNS says
+# authoritatively that the domain cannot receive mail (NXDOMAIN or null
+# MX), or None when the answer is unknown (timeouts, SERVFAIL, no dnspython)
+Resolver = Callable[[str], Optional[List[str]]]
+
+VALID = "valid"
+INVALID_SYNTAX = "invalid_syntax"
+NO_MX = "no_mx"
+REJECTED = "rejected"
+UNKNOWN = "unknown"
+
+
+@dataclass
+class ValidationResult:
+    email: str
+    deliverable: bool
+    reason: str
+    mx: Optional[str] = None
+
+
+def dns_resolve_mx(domain: str, timeout: float = 5.0) -> Optional[List[str]]:
+    """
+    Look up MX hosts with dnspython. Without it, or when the domain has
+    no MX records, fall back to an address lookup (RFC 5321 implicit MX);
+    the fallback can confirm a domain but never rejects one.
+
+    Returns:
+        Optional[List[str]]: MX hosts, [] for no mail, None if unknown
+    """
+    try:
+        import dns.exception
+        import dns.resolver
+    except ImportError:
+        logger.debug("dnspython is not installed; MX records cannot be checked")
+        return _address_fallback(domain)
+
+    try:
+        answer = dns.resolver.resolve(domain, "MX", lifetime=timeout)
+    except dns.resolver.NXDOMAIN:
+        return []
+    except dns.resolver.NoAnswer:
+        return _address_fallback(domain)
+    except dns.exception.DNSException as e:
+        # Timeouts and SERVFAIL from every nameserver (NoNameservers) say nothing about the domain
+        logger.warning(f"MX lookup for {domain} failed: {str(e)}")
+        return None
+    records = sorted(answer, key=lambda record: record.preference)
+    hosts = [str(record.exchange).rstrip(".") for record in records]
+    # Null MX (RFC 7505): the domain explicitly accepts no mail
+    return [host for host in hosts if host]
+
+
+def _address_fallback(domain: str) -> Optional[List[str]]:
+    try:
+        socket.getaddrinfo(domain, 25, proto=socket.IPPROTO_TCP)
+        return [domain]
+    except OSError:
+        # A missing address record says nothing about MX records, and a
+        # failing local resolver says nothing about the domain
+        return None
+
+
+class MXCache:
+    """
+    Per-domain MX answers with a TTL. Negative answers expire sooner and
+    unknown answers are not cached at all.
+    """
+
+    def __init__(self, ttl: float = 3600.0, negative_ttl: float = 300.0):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: Dict[str, Tuple[float, List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, domain: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[domain]
+                return None
+            return entry[1]
+
+    def set(self, domain: str, hosts: Optional[List[str]]):
+        if hosts is None:
+            return
+        ttl = self.ttl if hosts else self.negative_ttl
+        with self._lock:
+            self._entries[domain] = (time.monotonic() + ttl, hosts)
+
+
+class RecipientValidator:
+    """
+    Cheap pre-send checks that run before any LLM or SMTP login work.
+
+    Addresses are syntax-checked, then every distinct domain is resolved
+    once (concurrently, through a TTL cache). With ``probe`` each domain's
+    recipients are also checked with RCPT TO over one pooled connection to
+    its MX, without sending DATA. Unknown answers (DNS or probe timeouts)
+    never reject an address.
+    """
+
+    def __init__(self, resolver: Optional[Resolver] = None, cache: Optional[MXCache] = None,
+                 max_workers: int = 16, probe: bool = False, probe_sender: str = "",
+                 probe_port: int = 25, probe_pool: Optional[SMTPConnectionPool] = None):
+        self.resolver = resolver or dns_resolve_mx
+        self.cache = cache or MXCache()
+        self.max_workers = max_workers
+        self.probe = probe
+        self.probe_sender = probe_sender
+        self.probe_port = probe_port
+        self.probe_pool = probe_pool or SMTPConnectionPool(max_sessions=1, timeout=10.0,
+                                                           use_tls=False, authenticate=False)
+
+    def _lookup(self, domain: str) -> Optional[List[str]]:
+        hosts = self.cache.get(domain)
+        if hosts is not None:
+            return hosts
+        with REGISTRY.timed("mx_lookup_seconds"):
+            try:
+                hosts = self.resolver(domain)
+            except Exception as e:
+                logger.warning(f"MX lookup for {domain} failed: {str(e)}")
+                hosts = None
+        self.cache.set(domain, hosts)
+        return hosts
+
+    def resolve_domains(self, domains: Iterable[str]) -> Dict[str, Optional[List[str]]]:
+        """
+        Returns:
+            Dict[str, Optional[List[str]]]: MX hosts per domain, one lookup each
+        """
+        domains = list(dict.fromkeys(domains))
+        if len(domains) <= 1:
+            return {domain: self._lookup(domain) for domain in domains}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(domains))) as executor:
+            return dict(zip(domains, executor.map(self._lookup, domains)))
+
+    def _probe_domain(self, mx: str, emails: List[str]) -> Dict[str, Optional[bool]]:
+        outcome: Dict[str, Optional[bool]] = {email: None for email in emails}
+        try:
+            with self.probe_pool.session(mx, self.probe_port, self.probe_sender, "") as server:
+                code, _ = server.mail(self.probe_sender)
+                if code >= 400:
+                    return outcome
+                for email in emails:
+                    code, _ = server.rcpt(email)
+                    outcome[email] = True if code < 300 else False if code >= 500 else None
+                server.rset()
+        except (smtplib.SMTPException, OSError) as e:
+            logger.warning(f"RCPT probe against {mx} failed: {str(e)}")
+        return outcome
+
+    def validate(self, emails: Iterable[str]) -> List[ValidationResult]:
+        """
+        Returns:
+            List[ValidationResult]: one result per address, in input order
+        """
+        emails = [normalize_email(email) for email in emails]
+        results = []
+        by_domain: Dict[str, List[int]] = {}
+        for index, (email, valid) in enumerate(zip(emails, validate_emails(emails))):
+            if valid:
+                results.append(ValidationResult(email, True, VALID))
+                by_domain.setdefault(email.rsplit("@", 1)[1], []).append(index)
+            else:
+                results.append(ValidationResult(email, False, INVALID_SYNTAX))
+
+        probes = []
+        for domain, hosts in self.resolve_domains(by_domain).items():
+            for index in by_domain[domain]:
+                result = results[index]
+                if hosts is None:
+                    result.reason = UNKNOWN
+                elif not hosts:
+                    result.deliverable, result.reason = False, NO_MX
+                else:
+                    result.mx = hosts[0]
+            if hosts and self.probe:
+                probes.append((hosts[0], [results[index].email for index in by_domain[domain]]))
+
+        if probes:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(probes))) as executor:
+                outcomes = {}
+                for outcome in executor.map(lambda probe: self._probe_domain(*probe), probes):
+                    outcomes.update(outcome)
+            for result in results:
+                accepted = outcomes.get(result.email, True) if result.mx else True
+                if accepted is False:
+                    result.deliverable, result.reason = False, REJECTED
+                elif accepted is None:
+                    result.reason = UNKNOWN
+
+        rejected = sum(1 for result in results if not result.deliverable)
+        if rejected:
+            REGISTRY.inc("recipients_rejected_total", rejected)
+        return results
+
+    def filter(self, emails: Iterable[str]) -> Tuple[List[str], List[ValidationResult]]:
+        """
+        Returns:
+            Tuple[List[str], List[ValidationResult]]: (deliverable addresses,
+            results for the rejected ones)
+        """
+        results = self.validate(emails)
+        return ([result.email for result in results if result.deliverable],
+                [result for result in results if not result.deliverable])
+
+
+_shared_validator: Optional[RecipientValidator] = None
+_shared_validator_lock = threading.Lock()
+
+
+def get_shared_validator() -> RecipientValidator:
+    """Return the process-wide validator so its MX cache outlives sessions"""
+    global _shared_validator
+    with _shared_validator_lock:
+        if _shared_validator is None:
+            _shared_validator = RecipientValidator()
+        return _shared_validator